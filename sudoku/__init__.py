@@ -0,0 +1,20 @@
+"""A collection of sudoku generation and solving algorithms.
+
+Submodules are imported on first attribute access, so ``import sudoku`` stays cheap and
+numpy and the heavier solvers are only loaded once they are used, e.g. ``sudoku.dfs.dfs(code)``.
+"""
+import importlib
+
+__all__ = ['util', 'backtracking', 'dfs', 'deductive', 'generate', 'progress', 'service', 'trace', 'parallel', 'jobs', 'session']
+
+
+def __getattr__(name):
+    if name in __all__:
+        module = importlib.import_module(f'{__name__}.{name}')
+        globals()[name] = module
+        return module
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,16 +1,19 @@
-import os
-import sys
-sys.path.append('/'.join(os.path.abspath(__file__).split('/')[:-2]))
 from sudoku import util
+from collections import namedtuple
 import numpy as np
 
+BacktrackResult = namedtuple('BacktrackResult', ['solution', 'steps'])
+BacktrackCount = namedtuple('BacktrackCount', ['solutions', 'steps'])
 
-def naiive_backtrack(board_code):
+
+def naiive_backtrack(board_code, budget=None):
     """Naiive backtracking algorithm used to find the solution to a board with missing clues.
     Parameters
     ----------
     board_code : string
         Board code listed from top left to bottom right.
+    budget : Budget, optional
+        Node and time limits for the search.
 
     Returns
     -------
@@ -24,6 +27,9 @@ def naiive_backtrack(board_code):
 
     InvalidBoardException
         If the board code is invalid.
+
+    SearchLimitException
+        If the budget runs out.
     """
     board = util.code_to_board(board_code)
     if not util.board_is_valid(board):
@@ -34,13 +40,12 @@ def naiive_backtrack(board_code):
         return util.board_to_code(board)
 
     position = 0
-    step = 0
     while True:
-        step += 1
+        if budget is not None:
+            budget.tick()
         if position == 81:
             if not util.board_is_solved(search_board):
                 raise util.InvalidBoardException  # if we got here when solving there must have been an issue with the board code
-            print(f'Solved board in {step} steps')
             return util.board_to_code(search_board)
 
         x = util.to_x(position)
@@ -66,17 +71,24 @@ def naiive_backtrack(board_code):
                     raise util.UnsolvableBoardException
 
 
-def naiive_backtrack_count(board_code):
+def naiive_backtrack_count(board_code, budget=None):
     """Naiive backtracking algorithm used to count solutions to a board with missing clues.
     Parameters
     ----------
     board_code : string
         Board code listed from top left to bottom right.
+    budget : Budget, optional
+        Node and time limits for the search.
 
     Returns
     -------
     int
         The number of unique solutions the board has.
+
+    Raises
+    ------
+    SearchLimitException
+        If the budget runs out, its partial attribute holds the solutions counted so far.
     """
     board = util.code_to_board(board_code)
     search_board = np.copy(board)
@@ -85,10 +97,10 @@ def naiive_backtrack_count(board_code):
         return 1
 
     position = 0
-    step = 0
     solutions = 0
     while True:
-        step += 1
+        if budget is not None:
+            budget.tick(solutions)
         if position == 81:
             if not util.board_is_solved(search_board):
                 raise util.InvalidBoardException
@@ -97,7 +109,6 @@ def naiive_backtrack_count(board_code):
             while board[util.to_x(position)][util.to_y(position)] != 0:
                 position -= 1
                 if position < 0:
-                    print(f'found {solutions} solutions in {step} steps')
                     return solutions
 
         x = util.to_x(position)
@@ -115,10 +126,245 @@ def naiive_backtrack_count(board_code):
             search_board[x][y] = 0
             position -= 1
             if position < 0:
-                print(f'found {solutions} solutions in {step} steps')
                 return solutions
             while board[util.to_x(position)][util.to_y(position)] != 0:
                 position -= 1
                 if position < 0:
-                    print(f'found {solutions} solutions in {step} steps')
                     return solutions
+
+
+def _used_tables(board):
+    # used[unit][digit] tables for the rows, columns and boxes, and the empty cells in row order
+    rows = [[False] * 10 for i in range(9)]
+    cols = [[False] * 10 for i in range(9)]
+    boxes = [[False] * 10 for i in range(9)]
+    empties = []
+    for x in range(9):
+        for y in range(9):
+            digit = int(board[x][y])
+            b = (x // 3) * 3 + y // 3
+            if digit == 0:
+                empties.append((x, y, b))
+                continue
+            if rows[x][digit] or cols[y][digit] or boxes[b][digit]:
+                raise util.InvalidBoardException
+            rows[x][digit] = cols[y][digit] = boxes[b][digit] = True
+    return rows, cols, boxes, empties
+
+
+class SolutionIterator:
+    """Iterates over the solutions of a board one at a time, see iter_solutions.
+
+    The search runs over the empty cells in row order, trying digits in increasing order with
+    row, column and box used-digit tables. Its whole state is the digit placed in every empty cell
+    and the cell the search continues from, so it can be saved between solutions.
+
+    Parameters
+    ----------
+    board_code : string
+        Board code listed from top left to bottom right.
+    state : dict, optional
+        State returned by state() of an iterator over the same board, the iteration continues
+        after the last solution that iterator returned.
+    budget : Budget, optional
+        Node and time limits for the search.
+
+    Attributes
+    ----------
+    steps : int
+        Number of cells visited by this iterator.
+    found : int
+        Number of solutions found by this iterator.
+    """
+
+    def __init__(self, board_code, state=None, budget=None):
+        self.board_code = board_code
+        self.board = util.code_to_board(board_code)
+        self.rows, self.cols, self.boxes, self.empties = _used_tables(self.board)
+        self.budget = budget
+        self.steps = 0
+        self.found = 0
+        self.values = [0] * len(self.empties)
+        self.position = 0
+        if state is not None:
+            if state['board'] != board_code or len(state['values']) != len(self.empties):
+                raise ValueError('Search state belongs to a different board')
+            for (x, y, b), digit in zip(self.empties, state['values']):
+                if digit and (self.rows[x][digit] or self.cols[y][digit] or self.boxes[b][digit]):
+                    raise ValueError('Search state clashes with the board')
+                if digit:
+                    self.rows[x][digit] = self.cols[y][digit] = self.boxes[b][digit] = True
+            self.values = list(state['values'])
+            self.position = state['position']
+
+    def state(self):
+        """Saves where the iteration is.
+
+        Returns
+        -------
+        dict
+            JSON serializable state, pass it to iter_solutions to continue from here.
+        """
+        return {'board': self.board_code, 'position': self.position, 'values': list(self.values)}
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self._advance():
+            raise StopIteration
+        for (x, y, b), digit in zip(self.empties, self.values):
+            self.board[x][y] = digit
+        return util.board_to_code(self.board)
+
+    def count(self, limit=None):
+        """Runs the search past the next solutions without building their board codes.
+
+        Parameters
+        ----------
+        limit : int, optional
+            Stops after this many solutions, defaults to all remaining solutions.
+
+        Returns
+        -------
+        int
+            Number of solutions passed, the state afterwards is the same as after taking them with next.
+
+        Raises
+        ------
+        SearchLimitException
+            If the budget runs out, its partial attribute holds the solutions found by this iterator so far.
+        """
+        passed = 0
+        while (limit is None or passed < limit) and self._advance():
+            passed += 1
+        return passed
+
+    def _advance(self):
+        # runs the search up to the next solution, False once the search space is exhausted
+        rows, cols, boxes, empties, values, budget = self.rows, self.cols, self.boxes, self.empties, self.values, self.budget
+        count = len(empties)
+        i = self.position
+        while i >= 0:
+            if i == count:
+                self.found += 1
+                # the next search continues by changing the last cell
+                self.position = count - 1
+                return True
+            self.steps += 1
+            if budget is not None:
+                # the tables and values are consistent here, keep the state resumable if the budget runs out
+                self.position = i
+                budget.tick(self.found)
+            (x, y, b) = empties[i]
+            digit = values[i]
+            if digit:
+                rows[x][digit] = cols[y][digit] = boxes[b][digit] = False
+            digit += 1
+            while digit <= 9 and (rows[x][digit] or cols[y][digit] or boxes[b][digit]):
+                digit += 1
+            if digit <= 9:
+                values[i] = digit
+                rows[x][digit] = cols[y][digit] = boxes[b][digit] = True
+                i += 1
+            else:
+                values[i] = 0
+                i -= 1
+        self.position = -1
+        return False
+
+
+def iter_solutions(board_code, state=None, budget=None):
+    """Lazily enumerates the solutions of a board in a fixed order.
+
+    Only the current search path is kept, so memory stays constant however many solutions there are.
+
+    Parameters
+    ----------
+    board_code : string
+        Board code listed from top left to bottom right.
+    state : dict, optional
+        Result of SolutionIterator.state(), continues an earlier iteration over the same board.
+    budget : Budget, optional
+        Node and time limits for the search.
+
+    Returns
+    -------
+    SolutionIterator
+        Iterator of solution board codes.
+
+    Raises
+    ------
+    InvalidBoardException
+        If the board code is invalid.
+    ValueError
+        If the state belongs to a different board.
+    SearchLimitException
+        If the budget runs out while looking for the next solution.
+    """
+    return SolutionIterator(board_code, state, budget)
+
+
+def table_backtrack(board_code, budget=None):
+    """Backtracking over the empty cells with row, column and box used-digit tables.
+
+    Tries digits in the same order as naiive_backtrack, but skips the clues and checks a digit with
+    three table lookups instead of scanning its units.
+
+    Parameters
+    ----------
+    board_code : string
+        Board code listed from top left to bottom right.
+    budget : Budget, optional
+        Node and time limits for the search.
+
+    Returns
+    -------
+    BacktrackResult
+        (solution, steps) with the board code of the solved board and the number of cells visited.
+
+    Raises
+    ------
+    UnsolvableBoardException
+        If the board does not have a solution.
+
+    InvalidBoardException
+        If the board code is invalid.
+
+    SearchLimitException
+        If the budget runs out.
+    """
+    search = SolutionIterator(board_code, budget=budget)
+    solution = next(search, None)
+    if solution is None:
+        raise util.UnsolvableBoardException
+    return BacktrackResult(solution, search.steps)
+
+
+def table_backtrack_count(board_code, limit=None, budget=None):
+    """Counts the solutions of a board by backtracking with row, column and box used-digit tables.
+
+    Parameters
+    ----------
+    board_code : string
+        Board code listed from top left to bottom right.
+    limit : int, optional
+        Stops after finding this many solutions.
+    budget : Budget, optional
+        Node and time limits for the search.
+
+    Returns
+    -------
+    BacktrackCount
+        (solutions, steps) with the number of solutions and the number of cells visited.
+
+    Raises
+    ------
+    InvalidBoardException
+        If the board code is invalid.
+
+    SearchLimitException
+        If the budget runs out, its partial attribute holds the solutions counted so far.
+    """
+    search = SolutionIterator(board_code, budget=budget)
+    return BacktrackCount(search.count(limit), search.steps)
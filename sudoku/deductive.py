@@ -1,8 +1,5 @@
-import os
-import sys
-sys.path.append('/'.join(os.path.abspath(__file__).split('/')[:-2]))
 from sudoku import util
-from sudoku.util import load, code_to_board, init_guesses, update_guesses, print_board, units, move_string
+from sudoku.util import load, code_to_board, init_guesses, update_guesses, print_board, units
 import numpy as np
 
 
@@ -31,7 +28,7 @@ def naked_single_scan(board):
             if removed:
                 relevant_cells = [(x, y)]
                 relevant_candidates = [np.nonzero(board[a][b])[0] for (a, b) in relevant_cells]
-                return (True, relevant_cells, np.array(relevant_candidates))
+                return (True, relevant_cells, relevant_candidates)
     return False, None, None
 
 
@@ -63,7 +60,7 @@ def naked_pairs_scan(board):
                     if removed:
                         relevant_cells = [(x, y), (x1, y1)]
                         relevant_candidates = [np.nonzero(board[a][b])[0] for (a, b) in relevant_cells]
-                        return (True, relevant_cells, np.array(relevant_candidates))
+                        return (True, relevant_cells, relevant_candidates)
     return False, None, None
 
 
@@ -110,7 +107,7 @@ def naked_triples_scan(board):
                     if removed:
                         relevant_cells = [(x, y), (x1, y1), (x2, y2)]
                         relevant_candidates = [np.nonzero(board[a][b])[0] for (a, b) in relevant_cells]
-                        return (True, relevant_cells, np.array(relevant_candidates))
+                        return (True, relevant_cells, relevant_candidates)
 
     return False, None, None
 
@@ -166,7 +163,7 @@ def naked_quads_scan(board):
                     if removed:
                         relevant_cells = [(x, y), (x1, y1), (x2, y2), (x3, y3)]
                         relevant_candidates = [np.nonzero(board[a][b])[0] for (a, b) in relevant_cells]
-                        return (True, relevant_cells, np.array(relevant_candidates))
+                        return (True, relevant_cells, relevant_candidates)
 
     return False, None, None
 
@@ -196,7 +193,7 @@ def hidden_single_scan(board):
                         update_guesses(board, x, y)
                         relevant_cells = [(x, y)]
                         relevant_candidates = [np.nonzero(board[a][b])[0] for (a, b) in relevant_cells]
-                        return (True, relevant_cells, np.array(relevant_candidates))
+                        return (True, relevant_cells, relevant_candidates)
 
     return False, None, None
 
@@ -223,59 +220,44 @@ def hidden_quads_scan(board):
     return False, None, None
 
 
-def intersection_scan(board):
-    for x in range(9):
-        for y in range(9):
-            if np.sum(board[x][y]) == 1:
-                continue
+def _locked_candidates(candidates, present):
+    # finds locked candidates along the first axis of the board, other orientations are passed in transposed
+    # pointing: within a box a digit's candidates sit on a single line, so the rest of the line loses it
+    # claiming: within a line a digit's candidates sit in a single box, so the rest of the box loses it
+    segments = candidates.reshape(9, 3, 3, 9).any(axis=2)  # [line, box column, digit]
+    box_lines = segments.reshape(3, 3, 3, 9)  # [box row, line within box, box column, digit]
+    hits = []
+    for (ba, bb, z) in np.argwhere(box_lines.sum(axis=1) == 1):
+        a = ba * 3 + int(np.argmax(box_lines[ba, :, bb, z]))
+        targets = present[a, :, z].copy()
+        targets[bb * 3:bb * 3 + 3] = False
+        if targets.any():
+            source = [(a, b) for b in range(bb * 3, bb * 3 + 3) if candidates[a, b, z]]
+            hits.append((z, 0, source, [(a, b) for b in np.nonzero(targets)[0]]))
+    for (a, z) in np.argwhere(segments.sum(axis=1) == 1):
+        bb = int(np.argmax(segments[a, :, z]))
+        ba = a // 3
+        targets = present[ba * 3:ba * 3 + 3, bb * 3:bb * 3 + 3, z].copy()
+        targets[a - ba * 3] = False
+        if targets.any():
+            source = [(a, b) for b in range(9) if candidates[a, b, z]]
+            hits.append((z, 1, source, [(ba * 3 + i, bb * 3 + j) for (i, j) in np.argwhere(targets)]))
+    return hits
 
-            xy_units = units(x, y)
-            for z in range(9):
-                if board[x][y][z] == 0:
-                    continue
 
-                # pointing pairs and triples
-                for i in range(3):
-                    candidate_coords = []
-                    for (x1, y1) in xy_units[i]:
-                        if np.sum(board[x1][y1]) == 1:
-                            continue
-                        if board[x1][y1][z] == 1:
-                            candidate_coords.append((x1, y1))
-
-                    if len(candidate_coords) <= 3:
-                        removed = False
-                        if i == 2:
-                            # pointing pairs within the same box
-                            # check if the candidates line up on a row or column
-                            if all(map(lambda coord: coord in xy_units[0], candidate_coords)):
-                                # row lineup
-                                for (searchX, searchY) in xy_units[0]:
-                                    if not (searchX, searchY) in candidate_coords:
-                                        if board[searchX][searchY][z] == 1:
-                                            board[searchX][searchY][z] = 0
-                                            removed = True
-                            elif all(map(lambda coord: coord in xy_units[1], candidate_coords)):
-                                # col lineup
-                                for (searchX, searchY) in xy_units[1]:
-                                    if not (searchX, searchY) in candidate_coords:
-                                        if board[searchX][searchY][z] == 1:
-                                            board[searchX][searchY][z] = 0
-                                            removed = True
-                        else:
-                            # candidates on a row or column
-                            # check if they are in the same box
-                            if all(map(lambda coord: coord in xy_units[2], candidate_coords)):
-                                for (searchX, searchY) in xy_units[2]:
-                                    if not (searchX, searchY) in candidate_coords:
-                                        if board[searchX][searchY][z] == 1:
-                                            board[searchX][searchY][z] = 0
-                                            removed = True
-                        if removed:
-                            # relevant_candidates = [np.nonzero(board[a][b])[0] for (a, b) in candidate_coords]
-                            return (True, candidate_coords, np.array([[z]]))
-
-    return False, None, None
+def intersection_scan(board):
+    # locked candidates (pointing and claiming) for all digits at once from box/line segment occupancy
+    present = board == 1
+    candidates = present & (board.sum(axis=2) > 1)[:, :, None]
+    hits = _locked_candidates(candidates, present)
+    for (z, kind, source, targets) in _locked_candidates(candidates.transpose(1, 0, 2), present.transpose(1, 0, 2)):
+        hits.append((z, kind, [(y, x) for (x, y) in source], [(y, x) for (x, y) in targets]))
+    if not hits:
+        return False, None, None
+    (z, kind, source, targets) = min(hits, key=lambda hit: (hit[0], hit[1]))
+    for (x, y) in targets:
+        board[x][y][z] = 0
+    return (True, source, [[z]])
 
 
 def x_wing_scan(board):
@@ -344,7 +326,7 @@ def x_wing_scan(board):
                                 if removed:
                                     relevant_cells = x_wing[0] + x_wing[1]
                                     relevant_candidates = [np.nonzero(board[a][b])[0] for (a, b) in relevant_cells]
-                                    return (True, relevant_cells, np.array(relevant_candidates))
+                                    return (True, relevant_cells, relevant_candidates)
 
     return False, None, None
 
@@ -387,7 +369,7 @@ def y_wing_scan(board):
                             if removed:
                                 relevant_cells = [(x, y), (ax, ay), (bx, by), (cx, cy)]
                                 relevant_candidates = [[cz]]
-                                return (True, relevant_cells, np.array(relevant_candidates))
+                                return (True, relevant_cells, relevant_candidates)
 
     return False, None, None
 
@@ -404,59 +386,580 @@ def xyz_wing_scan(board):
     return False, None, None
 
 
-def deductive_solve(board, log_moves=False):
-    # method tuple structure is (method, index, difficulty-factor)
-    # so methods get executed in order of index and increment difficulty based on difficulty factor
-    deductive_methods = {
-        'naked_single': (naked_single_scan, 1, 1),
-        'hidden_single': (hidden_single_scan, 2, 2),
-        'intersection': (intersection_scan, 4, 2),
-        'naked_pairs': (naked_pairs_scan, 5, 3),
-        # 'hidden_pairs': (hidden_pairs_scan, 6, 3),
-        'naked_triples': (naked_triples_scan, 7, 3),
-        # 'hidden_triples': (hidden_triples_scan, 8, 4),
-        'naked_quads': (naked_quads_scan, 9, 4),
-        # 'hidden_quads': (hidden_quads_scan, 10, 4),
-        'x_wing': (x_wing_scan, 11, 5),
-        'y_wing': (y_wing_scan, 12, 5),
-        'xyz_wing': (xyz_wing_scan, 13, 6),
-        # 'swordfish': (swordfish_scan, 14, 6),
-        # 'jellyfish': (jellyfish_scan, 15, 7)
-    }
-    if board.shape == (9, 9):
-        board = init_guesses(board)
+_templates = None
+
 
-    modified = True
-    i = 0
-    while modified:
-        i += 1
-        modified = False
+def templates():
+    """All placements of one digit that respect the rules, built on first use.
 
-        # TODO someday remove this once tests are finished
-        failed = False
+    A template puts the digit once in every row, column and box, there are 46,656 of them.
+    Each is packed as three 27 bit words, word b holds the cells of band b (rows 3b - 3b + 2),
+    cell (x, y) at bit (x % 3) * 9 + y.
+
+    Returns
+    -------
+    ndarray
+        uint32 array of shape (46656, 3).
+    """
+    global _templates
+    if _templates is None:
+        # extend partial templates a row at a time, keeping columns and boxes free of repeats
+        columns = np.zeros((1, 0), np.int64)
         for x in range(9):
-            for y in range(9):
-                if np.sum(board[x][y]) == 0:
-                    print(x, y)
-                    failed = True
-                    break
-        if failed:
-            print_board(board)
+            count = len(columns)
+            columns = np.concatenate((np.repeat(columns, 9, axis=0), np.tile(np.arange(9), count)[:, None]), axis=1)
+            last = columns[:, -1:]
+            keep = (columns[:, :-1] != last).all(axis=1)
+            band_rows = columns[:, x - x % 3:x]
+            keep &= (band_rows // 3 != last // 3).all(axis=1)
+            columns = columns[keep]
+        bits = np.left_shift(1, (np.arange(9) % 3) * 9 + columns)
+        _templates = bits.reshape(-1, 3, 3).sum(axis=2).astype(np.uint32)
+    return _templates
+
+
+def _pack(cells):
+    # packs (..., 9, 9) boolean arrays into the template word layout
+    weights = np.left_shift(1, np.arange(27, dtype=np.int64)).reshape(3, 9)
+    return (cells.reshape(cells.shape[:-2] + (3, 3, 9)) * weights).sum(axis=(-2, -1)).astype(np.uint32)
+
+
+def _unpack(words):
+    return ((words.astype(np.int64)[:, None] >> np.arange(27)) & 1).reshape(9, 9).astype(bool)
+
+
+def template_scan(board):
+    # pattern overlay: a candidate no template of its digit covers is eliminated, and a cell every template
+    # of a digit covers holds that digit. Templates of a digit are first matched against its candidates and
+    # solved cells, then dropped while they overlap a cell another digit is forced into, until nothing changes
+    table = templates()
+    present = board == 1
+    candidates = _pack(present.transpose(2, 0, 1))
+    placed = _pack((present & (board.sum(axis=2) == 1)[:, :, None]).transpose(2, 0, 1))
+    alive = []
+    for z in range(9):
+        # match band by band, so later bands only look at the templates that survived earlier ones
+        survivors = table
+        for band in range(3):
+            words = survivors[:, band]
+            survivors = survivors[((words & ~candidates[z, band]) == 0) & ((words & placed[z, band]) == placed[z, band])]
+        alive.append(survivors)
+    changed = True
+    while changed:
+        if not all(len(survivors) for survivors in alive):
             raise SolverFailedException
+        forced = np.array([np.bitwise_and.reduce(survivors, axis=0) for survivors in alive])
+        changed = False
+        for z in range(9):
+            others = np.bitwise_or.reduce(np.delete(forced, z, axis=0), axis=0)
+            keep = ~(alive[z] & others).any(axis=1)
+            if not keep.all():
+                alive[z] = alive[z][keep]
+                changed = True
+    for z in range(9):
+        uncovered = present[:, :, z] & ~_unpack(np.bitwise_or.reduce(alive[z], axis=0))
+        placements = _unpack(forced[z]) & (board.sum(axis=2) > 1)
+        if not (uncovered.any() or placements.any()):
+            continue
+        board[:, :, z][uncovered] = 0
+        for (x, y) in np.argwhere(placements):
+            board[x, y, :z] = 0
+            board[x, y, z + 1:] = 0
+        cells = sorted(map(tuple, np.argwhere(uncovered | placements).tolist()))
+        return (True, cells, [[z]])
+    return False, None, None
+
 
-        for key in deductive_methods:
-            result, coords, candidates = deductive_methods[key][0](board)
-            if result:
-                modified = True
-                if log_moves:
-                    print(i, move_string(key, coords, candidates))
-                    moves.append((key, coords, candidates))
-                    print_board(board)
-                break
-    if log_moves:
-        print_board(board)
-        for i, move in enumerate(moves):
-            print(i + 1, move_string(*move))
+# cells of the 27 units in util.board_units order (rows, columns, boxes) and the units of every cell
+UNIT_CELLS = [[(x, y) for y in range(9)] for x in range(9)] + \
+    [[(x, y) for x in range(9)] for y in range(9)] + \
+    [[(bx * 3 + i // 3, by * 3 + i % 3) for i in range(9)] for bx in range(3) for by in range(3)]
+CELL_UNITS = [[(x, 9 + y, 18 + (x // 3) * 3 + y // 3) for y in range(9)] for x in range(9)]
+PEERS = [[sorted(set(cell for unit in CELL_UNITS[x][y] for cell in UNIT_CELLS[unit]) - {(x, y)}) for y in range(9)] for x in range(9)]
+PEER_SETS = [[frozenset(PEERS[x][y]) for y in range(9)] for x in range(9)]
+
+
+def _unit_pairs(board):
+    # for every digit, the units where it is left in exactly two cells, mapped to the two cells
+    counts = util.board_units(board.transpose(2, 0, 1)).sum(axis=-1)
+    pairs = [{} for z in range(9)]
+    for (z, unit) in np.argwhere(counts == 2).tolist():
+        pairs[z][unit] = tuple(cell for cell in UNIT_CELLS[unit] if board[cell][z])
+    return pairs
+
+
+def _digit_links(board, z, pairs):
+    # cells of digit z that are not solved and the strong links between them: a unit where the digit
+    # is left in exactly two cells. Weak links join any two peers, found through PEERS
+    unsolved = ((board[:, :, z] == 1) & (board.sum(axis=2) > 1)).tolist()
+    strong = {}
+    for (a, b) in pairs[z].values():
+        if unsolved[a[0]][a[1]] and unsolved[b[0]][b[1]]:
+            strong.setdefault(a, set()).add(b)
+            strong.setdefault(b, set()).add(a)
+    return unsolved, strong
+
+
+def simple_coloring_scan(board, pairs=None):
+    # colors the cells joined by strong links of a digit in two alternating colors, one color holds the digit.
+    # A color with two cells that see each other is false, and cells seeing both colors lose the digit.
+    # pairs are the two-cell units kept by a SinglesPropagator, built from the board when not given
+    if pairs is None:
+        pairs = _unit_pairs(board)
+    for z in range(9):
+        unsolved, strong = _digit_links(board, z, pairs)
+        colored = set()
+        for start in sorted(strong):
+            if start in colored:
+                continue
+            colors = {start: 0}
+            queue = [start]
+            for cell in queue:
+                for other in sorted(strong[cell]):
+                    if other not in colors:
+                        colors[other] = 1 - colors[cell]
+                        queue.append(other)
+            colored.update(colors)
+            chain = sorted(colors)
+            groups = [[cell for cell in chain if colors[cell] == color] for color in (0, 1)]
+            for group in groups:
+                if any(colors.get(other) == colors[cell] for cell in group for other in PEER_SETS[cell[0]][cell[1]]):
+                    for (x, y) in group:
+                        board[x][y][z] = 0
+                    return (True, chain, [[z]])
+            seen = [set().union(*(PEER_SETS[x][y] for (x, y) in group)) for group in groups]
+            targets = sorted(cell for cell in seen[0] & seen[1] if unsolved[cell[0]][cell[1]] and cell not in colors)
+            if targets:
+                for (x, y) in targets:
+                    board[x][y][z] = 0
+                return (True, chain + targets, [[z]])
+    return False, None, None
+
+
+def x_chain_scan(board, pairs=None):
+    # alternating chains of a digit that start and end with a strong link: if the first cell is false the last
+    # one is true, so cells seeing both ends lose the digit. Breadth first search over (cell, holds digit) states
+    # finds the shortest chain from each start, weak links and targets come from the peers of a cell, so each
+    # search is linear in the cells of the digit. pairs are the two-cell units kept by a SinglesPropagator
+    if pairs is None:
+        pairs = _unit_pairs(board)
+    for z in range(9):
+        unsolved, strong = _digit_links(board, z, pairs)
+        for start in sorted(strong):
+            parents = {(start, False): None}
+            queue = [(start, False)]
+            for state in queue:
+                (cell, value) = state
+                if value:
+                    if cell != start:
+                        common = PEER_SETS[start[0]][start[1]] & PEER_SETS[cell[0]][cell[1]]
+                        targets = sorted(other for other in common if unsolved[other[0]][other[1]])
+                        if targets:
+                            chain = []
+                            while state is not None:
+                                chain.append(state[0])
+                                state = parents[state]
+                            for (x, y) in targets:
+                                board[x][y][z] = 0
+                            return (True, chain[::-1] + targets, [[z]])
+                    following = [(other, False) for other in PEERS[cell[0]][cell[1]] if unsolved[other[0]][other[1]]]
+                else:
+                    following = [(other, True) for other in sorted(strong.get(cell, ()))]
+                for other in following:
+                    if other not in parents:
+                        parents[other] = state
+                        queue.append(other)
+    return False, None, None
+
+
+class SinglesPropagator:
+    """Naked and hidden single propagation driven by candidate count tables.
+
+    Keeps the number of candidates of every cell and, for every unit, the number of cells that still
+    hold each digit. Eliminations update the counts and queue cells that become naked singles and
+    unit digits that become hidden singles, so finding the next single is a queue pop instead of a
+    board scan. The units where a digit is down to two cells are kept along with the counts, they are
+    the strong links read by the chain techniques. The board is modified in place, call sync after
+    changing it from outside.
+
+    It drives the singles of solve_moves, and so of rate, deductive_solve and next_move. The searches in
+    dfs and generate keep their own bitmask propagation, which also covers boards other than 9x9.
+
+    Parameters
+    ----------
+    board : ndarray
+        3D guess board.
+    """
+
+    techniques = ('naked_single', 'hidden_single')
+    # techniques whose scans take the propagator's two-cell units
+    link_techniques = ('simple_coloring', 'x_chain')
+
+    def __init__(self, board):
+        self.board = board
+        self.sync()
+
+    def sync(self):
+        """Rebuilds the count tables and queues from the board.
+
+        Raises
+        ------
+        SolverFailedException
+            If a cell has no candidates or a unit has no place left for a digit.
+        """
+        self.cell_counts = self.board.sum(axis=2).tolist()
+        self.unit_counts = util.board_units(self.board.transpose(2, 0, 1)).sum(axis=-1).T.tolist()
+        self.pairs = _unit_pairs(self.board)
+        self.naked = [(x, y) for x in range(9) for y in range(9) if self.cell_counts[x][y] == 1]
+        self.hidden = [(unit, z) for unit in range(27) for z in range(9) if self.unit_counts[unit][z] == 1]
+        if min(map(min, self.cell_counts)) == 0 or min(map(min, self.unit_counts)) == 0:
+            raise SolverFailedException
+
+    def eliminate(self, x, y, z):
+        """Removes candidate z from cell (x, y) and updates the counts.
+
+        Raises
+        ------
+        SolverFailedException
+            If the cell or one of its units is left without a place for a digit.
+        """
+        self.board[x][y][z] = 0
+        self.cell_counts[x][y] -= 1
+        count = self.cell_counts[x][y]
+        if count == 1:
+            self.naked.append((x, y))
+        elif count == 0:
+            raise SolverFailedException
+        for unit in CELL_UNITS[x][y]:
+            self.unit_counts[unit][z] -= 1
+            count = self.unit_counts[unit][z]
+            if count == 2:
+                self.pairs[z][unit] = tuple(cell for cell in UNIT_CELLS[unit] if self.board[cell][z])
+            elif count == 1:
+                del self.pairs[z][unit]
+                self.hidden.append((unit, z))
+            elif count == 0:
+                raise SolverFailedException
+
+    def place(self, x, y, z):
+        """Fixes cell (x, y) to candidate z and removes z from its peers.
+
+        Returns
+        -------
+        bool
+            Whether any candidate was removed.
+        """
+        removed = False
+        for zz in range(9):
+            if zz != z and self.board[x][y][zz]:
+                self.eliminate(x, y, zz)
+                removed = True
+        for (xx, yy) in PEERS[x][y]:
+            if self.board[xx][yy][z]:
+                self.eliminate(xx, yy, z)
+                removed = True
+        return removed
+
+    def pop(self):
+        """Applies the next naked single, or the next hidden single if there are no naked singles.
+
+        Returns
+        -------
+        tuple or None
+            (technique, coords, candidates) move in the scan function format, or None if no single applies.
+
+        Raises
+        ------
+        SolverFailedException
+            If the board runs into a contradiction.
+        """
+        while self.naked:
+            (x, y) = self.naked.pop()
+            if self.cell_counts[x][y] != 1:
+                continue
+            z = int(np.argmax(self.board[x][y]))
+            if self.place(x, y, z):
+                return ('naked_single', [(x, y)], [[z]])
+        while self.hidden:
+            (unit, z) = self.hidden.pop()
+            if self.unit_counts[unit][z] != 1:
+                continue
+            for (x, y) in UNIT_CELLS[unit]:
+                if self.board[x][y][z]:
+                    break
+            if self.cell_counts[x][y] == 1:
+                continue
+            self.place(x, y, z)
+            return ('hidden_single', [(x, y)], [[z]])
+        return None
+
+    def solved(self):
+        """Checks whether every cell is down to a single candidate.
+
+        Returns
+        -------
+        bool
+        """
+        return sum(map(sum, self.cell_counts)) == 81
+
+    def propagate(self):
+        """Applies singles until none are left.
+
+        Returns
+        -------
+        bool
+            False if the board ran into a contradiction.
+        """
+        try:
+            while self.pop() is not None:
+                pass
+        except SolverFailedException:
+            return False
+        return True
+
+
+# method tuple structure is (method, index, difficulty-factor)
+# so methods get executed in order of index and increment difficulty based on difficulty factor
+deductive_methods = {
+    'naked_single': (naked_single_scan, 1, 1),
+    'hidden_single': (hidden_single_scan, 2, 2),
+    'intersection': (intersection_scan, 4, 2),
+    'naked_pairs': (naked_pairs_scan, 5, 3),
+    # 'hidden_pairs': (hidden_pairs_scan, 6, 3),
+    'naked_triples': (naked_triples_scan, 7, 3),
+    # 'hidden_triples': (hidden_triples_scan, 8, 4),
+    'naked_quads': (naked_quads_scan, 9, 4),
+    # 'hidden_quads': (hidden_quads_scan, 10, 4),
+    'x_wing': (x_wing_scan, 11, 5),
+    'y_wing': (y_wing_scan, 12, 5),
+    'xyz_wing': (xyz_wing_scan, 13, 6),
+    'simple_coloring': (simple_coloring_scan, 14, 6),
+    'x_chain': (x_chain_scan, 15, 7),
+    'template': (template_scan, 16, 8),
+    # 'swordfish': (swordfish_scan, 17, 6),
+    # 'jellyfish': (jellyfish_scan, 18, 7),
+}
+
+
+def solve_moves(board):
+    """Applies deductive moves to a guess board one at a time, cheapest technique first.
+
+    Singles come from a SinglesPropagator, the other techniques are scanned in deductive_methods order.
+
+    Parameters
+    ----------
+    board : ndarray
+        3D guess board, modified in place.
+
+    Yields
+    ------
+    tuple
+        (technique, coords, candidates) for every move, until no technique applies.
+
+    Raises
+    ------
+    SolverFailedException
+        If a cell or unit runs out of candidates.
+    """
+    propagator = SinglesPropagator(board)
+    while True:
+        move = propagator.pop()
+        if move is None:
+            if propagator.solved():
+                return
+            for key in deductive_methods:
+                if key in propagator.techniques:
+                    continue
+                scan = deductive_methods[key][0]
+                if key in propagator.link_techniques:
+                    result, coords, candidates = scan(board, propagator.pairs)
+                else:
+                    result, coords, candidates = scan(board)
+                if result:
+                    move = (key, coords, candidates)
+                    propagator.sync()
+                    break
+            else:
+                return
+        yield move
+
+
+def next_move(board, candidates=None, guesses=None):
+    """Finds the next deductive move on a partially filled board without solving the rest of it.
+
+    Techniques are tried in deductive_methods order and the first one that applies is returned,
+    so the hint is always the cheapest step available.
+
+    Parameters
+    ----------
+    board : ndarray
+        2D board, 0 for empty cells.
+    candidates : ndarray, optional
+        3D guess board of pencil marks for the empty cells, candidates that clash with filled cells are
+        dropped. Defaults to every candidate the filled cells allow.
+    guesses : ndarray, optional
+        3D guess board already in sync with the board, e.g. kept by a session, used instead of
+        rebuilding one. The board is not checked for validity and the guess board is not modified.
+
+    Returns
+    -------
+    tuple or None
+        (technique, coords, candidates, eliminations) with the move in the scan function format and
+        eliminations as the (x, y, z) candidates it removes, or None if no technique applies or the board is full.
+
+    Raises
+    ------
+    InvalidBoardException
+        If the board is invalid.
+    SolverFailedException
+        If the pencil marks leave a cell or unit without candidates.
+    """
+    if guesses is None:
+        guesses = init_guesses(board)
+    else:
+        guesses = guesses.copy()
+    if candidates is not None:
+        empty = board == 0
+        guesses[empty] &= np.asarray(candidates, dtype=guesses.dtype)[empty]
+    before = guesses.copy()
+    counts = guesses.sum(axis=2)
+    pending = np.argwhere((board == 0) & (counts == 1))
+    if len(pending):
+        # pencil marks down to one digit in an empty cell, the cell only needs to be filled in
+        (x, y) = pending[0].tolist()
+        propagator = SinglesPropagator(guesses)
+        z = int(np.argmax(guesses[x][y]))
+        propagator.place(x, y, z)
+        move = ('naked_single', [(x, y)], [[z]])
+    else:
+        move = next(solve_moves(guesses), None)
+        if move is None:
+            return None
+    eliminations = [(x, y, z) for (x, y, z) in np.argwhere(before > guesses).tolist()]
+    return (*move, eliminations)
+
+
+def rate(board, max_difficulty=None, budget=None):
+    """Rates a board by the total difficulty of the moves needed to solve it with deductive techniques.
+
+    Every move adds the difficulty factor of its technique, so the rating only grows while solving
+    and the search is abandoned as soon as it passes max_difficulty.
+
+    Parameters
+    ----------
+    board : ndarray
+        2D board or 3D guess board, guess boards are modified in place.
+    max_difficulty : int, optional
+        Rating cap, boards that go over it are not rated.
+    budget : Budget, optional
+        Node and time limits, every move counts as a node.
+
+    Returns
+    -------
+    int or None
+        Difficulty of the board, or None if the techniques can't solve it or the rating passes max_difficulty.
+
+    Raises
+    ------
+    SearchLimitException
+        If the budget runs out.
+    """
+    if board.shape == (9, 9):
+        board = init_guesses(board)
+
+    difficulty = 0
+    try:
+        for key, _, _ in solve_moves(board):
+            if budget is not None:
+                budget.tick()
+            difficulty += deductive_methods[key][2]
+            if max_difficulty is not None and difficulty > max_difficulty:
+                return None
+    except SolverFailedException:
+        return None
+
+    if not util.board_is_solved(util.remove_guesses(board)):
+        return None
+    return difficulty
+
+
+def difficulty_bound(empty_cells):
+    """Upper bound on the rating of any solvable board with a number of empty cells.
+
+    Every move removes at least one candidate and each empty cell gives up at most 8 of them.
+
+    Parameters
+    ----------
+    empty_cells : int
+
+    Returns
+    -------
+    int
+        Rating no board with this many empty cells can exceed.
+    """
+    return 8 * empty_cells * max(factor for (_, _, factor) in deductive_methods.values())
+
+
+def difficulty_estimate(empty_cells):
+    """Rough rating a board with a number of empty cells is not expected to exceed, not a bound.
+
+    Every empty cell is filled by one single (factor 1 or 2) and the harder moves in between stay rare:
+    on tests/test-boards.json and on generated boards ratings stay below 2 per empty cell. The estimate
+    allows half the factor of the hardest technique per empty cell, and a board with a unique solution
+    has at least 17 clues, so at most 64 empty cells count.
+
+    Parameters
+    ----------
+    empty_cells : int
+
+    Returns
+    -------
+    int
+        Estimated rating limit, boards can go over it.
+    """
+    return min(empty_cells, 64) * max(factor for (_, _, factor) in deductive_methods.values()) // 2
+
+
+def deductive_solve(board, log_moves=False, trace=None):
+    """Solves a board as far as the deductive techniques get.
+
+    Parameters
+    ----------
+    board : ndarray
+        2D board or 3D guess board, guess boards are modified in place.
+    log_moves : bool
+        Prints the moves and the final board.
+    trace : sudoku.trace.Trace, optional
+        Records every move.
+
+    Returns
+    -------
+    ndarray
+        2D board, cells the techniques could not solve are 0.
+
+    Raises
+    ------
+    SolverFailedException
+        If a cell or unit runs out of candidates.
+    """
+    if board.shape == (9, 9):
+        board = init_guesses(board)
+    if log_moves and trace is None:
+        from sudoku.trace import Trace
+        trace = Trace()
+
+    try:
+        if trace is None:
+            for _ in solve_moves(board):
+                pass
+        else:
+            for move in solve_moves(board):
+                trace.record(*move)
+    finally:
+        if log_moves:
+            for line in trace.render():
+                print(line)
+            print_board(board)
 
     return util.remove_guesses(board)
 
@@ -490,7 +993,6 @@ def test_all_boards():
 
 if __name__ == "__main__":
     # test_all_boards()
-    moves = []
     # code = load('tests/test-boards.json')['25'][0]
     code = '000000430100830090602000108001008064020070951000900380080010000703485609040003800'
     print(code)
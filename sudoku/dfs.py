@@ -1,15 +1,15 @@
-import os
-import sys
-sys.path.append('/'.join(os.path.abspath(__file__).split('/')[:-2]))
 from sudoku import util
+import numpy as np
 
 
-def dfs(board_code):
+def dfs(board_code, budget=None):
     """Depth first search of board solutions, selecting branches with fewest possible guesses.
     Parameters
     ----------
     board_code : string
         Board code listed from top left to bottom right.
+    budget : Budget, optional
+        Node and time limits for the search.
 
     Returns
     -------
@@ -20,25 +20,29 @@ def dfs(board_code):
     ------
     UnsolvableBoardException
         If the board does not have a solution.
+    SearchLimitException
+        If the budget runs out.
     """
     board = util.code_to_board(board_code)
 
     if util.board_is_solved(board):
         return util.board_to_code(board)
 
-    return dfs_from_board(board)
+    return dfs_from_board(board, budget)
 
 
-def dfs_from_board(board):
+def dfs_from_board(board, budget=None):
     guesses = util.generate_guess_list(board)
-    result = dfs_recursive(board, guesses)
+    result = dfs_recursive(board, guesses, budget)
     if result is False:
         raise util.UnsolvableBoardException
     else:
         return util.board_to_code(result)
 
 
-def dfs_recursive(board, guesses):
+def dfs_recursive(board, guesses, budget=None):
+    if budget is not None:
+        budget.tick()
     if len(guesses) == 0:
         if util.board_is_solved(board):
             return board
@@ -60,7 +64,7 @@ def dfs_recursive(board, guesses):
                         return False
             updated_guesses.append(new_guess)
         updated_guesses = sorted(updated_guesses, key=lambda guess: len(guess['guesses']))
-        next_step = dfs_recursive(board, updated_guesses)
+        next_step = dfs_recursive(board, updated_guesses, budget)
         if next_step is False:
             continue
         else:
@@ -69,7 +73,9 @@ def dfs_recursive(board, guesses):
     return False
 
 
-def test_unique_recursive(board, guesses):
+def test_unique_recursive(board, guesses, budget=None):
+    if budget is not None:
+        budget.tick()
     if len(guesses) == 0:
         if util.board_is_solved(board):
             return 1
@@ -92,12 +98,309 @@ def test_unique_recursive(board, guesses):
                         return 0
             updated_guesses.append(new_guess)
         updated_guesses = sorted(updated_guesses, key=lambda guess: len(guess['guesses']))
-        next_step = test_unique_recursive(board, updated_guesses)
+        next_step = test_unique_recursive(board, updated_guesses, budget)
         solutions += next_step
 
     return solutions
 
 
-def test_unique(board):
-    solutions = test_unique_recursive(board, util.generate_guess_list(board))
-    return solutions == 1
+def test_unique(board, box_size=3, budget=None):
+    """Checks whether a board has exactly one solution, stopping as soon as a second one turns up.
+
+    Parameters
+    ----------
+    board : ndarray
+        Board array, it is not modified.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+    budget : Budget, optional
+        Node and time limits for the search.
+
+    Returns
+    -------
+    bool
+        Whether the board has a unique solution.
+
+    Raises
+    ------
+    SearchLimitException
+        If the budget runs out.
+    """
+    return count_solutions(board, box_size, limit=2, budget=budget) == 1
+
+
+def _bitmask_search(board, box_size=3, limit=1, rng=None, budget=None):
+    """Iterative depth first search over row, column and box digit bitmasks.
+
+    Each node branches on the empty cell with the fewest candidates. When no cell is forced it also
+    looks for digits with a single place in a unit (hidden singles) and prunes units where a missing
+    digit has no place left, all with bitwise operations, so the search holds up on large boards.
+
+    Parameters
+    ----------
+    board : ndarray
+        Board array, it is not modified.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+    limit : int, optional
+        Stops after finding this many solutions, None searches the whole tree.
+    rng : numpy.random.Generator, optional
+        Tries candidates in a random order instead of ascending, anything with a random() method works.
+    budget : Budget, optional
+        Node and time limits for the search.
+
+    Returns
+    -------
+    tuple
+        (number of solutions found, first solution as a board array or None)
+
+    Raises
+    ------
+    SearchLimitException
+        If the budget runs out, its partial attribute holds the solutions counted so far.
+    """
+    side = box_size * box_size
+    full = (1 << side) - 1
+    used = [0] * (3 * side)  # used digits of the rows, then the columns, then the boxes
+    cell_units = []
+    units = [[] for i in range(3 * side)]
+    for cell in range(side * side):
+        x, y = divmod(cell, side)
+        b = (x // box_size) * box_size + y // box_size
+        cell_units.append((x, side + y, 2 * side + b))
+        for unit in cell_units[cell]:
+            units[unit].append(cell)
+
+    empties = []
+    for cell, digit in enumerate(np.asarray(board).ravel()):
+        r, c, b = cell_units[cell]
+        if digit == 0:
+            empties.append(cell)
+            continue
+        bit = 1 << (int(digit) - 1)
+        if (used[r] | used[c] | used[b]) & bit:
+            # clues already clash
+            return 0, None
+        used[r] |= bit
+        used[c] |= bit
+        used[b] |= bit
+
+    total = len(empties)
+    where = [0] * (side * side)  # index of each empty cell in empties
+    for i, cell in enumerate(empties):
+        where[cell] = i
+    free = [False] * (side * side)
+    for cell in empties:
+        free[cell] = True
+    masks = [0] * (side * side)
+    remaining = [0] * total  # candidates still to try at each depth
+    values = [0] * total  # candidate bit placed at each depth
+    solutions = 0
+    first = None
+    depth = 0
+    advance = True
+    while True:
+        if advance:
+            if budget is not None:
+                budget.tick(solutions)
+            if depth == total:
+                solutions += 1
+                if first is None:
+                    first = np.array(board, np.int8).ravel()
+                    for cell, bit in zip(empties, values):
+                        first[cell] = bit.bit_length()
+                    first = first.reshape(side, side)
+                if limit is not None and solutions >= limit:
+                    break
+                depth -= 1
+                advance = False
+                if depth < 0:
+                    break
+                continue
+            # pick the empty cell with the fewest candidates
+            best = depth
+            best_count = side + 1
+            best_mask = 0
+            for i in range(depth, total):
+                cell = empties[i]
+                r, c, b = cell_units[cell]
+                mask = full & ~(used[r] | used[c] | used[b])
+                masks[cell] = mask
+                count = mask.bit_count()
+                if count < best_count:
+                    best, best_count, best_mask = i, count, mask
+                    if count <= 1:
+                        break
+            if best_count > 1:
+                # look for a digit with a single place in some unit, or with no place at all
+                for unit in range(3 * side):
+                    once = twice = 0
+                    for cell in units[unit]:
+                        if free[cell]:
+                            twice |= once & masks[cell]
+                            once |= masks[cell]
+                    if full & ~used[unit] & ~once:
+                        best_mask = 0
+                        break
+                    singles = once & ~twice
+                    if singles:
+                        bit = singles & -singles
+                        for cell in units[unit]:
+                            if free[cell] and masks[cell] & bit:
+                                best, best_mask = where[cell], bit
+                                break
+                        break
+            cell = empties[best]
+            empties[best] = empties[depth]
+            where[empties[best]] = best
+            empties[depth] = cell
+            where[cell] = depth
+            remaining[depth] = best_mask
+            free[cell] = False
+        else:
+            # undo the candidate placed at this depth before trying the next one
+            r, c, b = cell_units[empties[depth]]
+            bit = values[depth]
+            used[r] ^= bit
+            used[c] ^= bit
+            used[b] ^= bit
+
+        mask = remaining[depth]
+        if mask == 0:
+            free[empties[depth]] = True
+            depth -= 1
+            advance = False
+            if depth < 0:
+                break
+            continue
+        if rng is None:
+            bit = mask & -mask
+        else:
+            bits = [1 << i for i in range(side) if mask >> i & 1]
+            bit = bits[int(rng.random() * len(bits))]
+        remaining[depth] = mask ^ bit
+        values[depth] = bit
+        r, c, b = cell_units[empties[depth]]
+        used[r] |= bit
+        used[c] |= bit
+        used[b] |= bit
+        depth += 1
+        advance = True
+
+    return solutions, first
+
+
+def dfs_bitmask(board_code, box_size=3, budget=None):
+    """Depth first search over digit bitmasks, works for any box size.
+
+    Parameters
+    ----------
+    board_code : string
+        Board code listed from top left to bottom right.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+    budget : Budget, optional
+        Node and time limits for the search.
+
+    Returns
+    -------
+    string
+        Board code for solved board.
+
+    Raises
+    ------
+    UnsolvableBoardException
+        If the board does not have a solution.
+    SearchLimitException
+        If the budget runs out.
+    """
+    return util.board_to_code(solve_board(util.code_to_board(board_code, box_size), box_size, budget), box_size)
+
+
+def solve_board(board, box_size=3, budget=None):
+    """Solves a board array with the bitmask search.
+
+    Parameters
+    ----------
+    board : ndarray
+        Board array, it is not modified.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+    budget : Budget, optional
+        Node and time limits for the search.
+
+    Returns
+    -------
+    ndarray
+        Solved board.
+
+    Raises
+    ------
+    UnsolvableBoardException
+        If the board does not have a solution.
+    SearchLimitException
+        If the budget runs out.
+    """
+    solutions, solution = _bitmask_search(board, box_size, budget=budget)
+    if solutions == 0:
+        raise util.UnsolvableBoardException
+    return solution
+
+
+def count_solutions(board, box_size=3, limit=None, budget=None):
+    """Counts the solutions of a board with the bitmask search.
+
+    Parameters
+    ----------
+    board : ndarray
+        Board array, it is not modified.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+    limit : int, optional
+        Stops counting once this many solutions are found.
+    budget : Budget, optional
+        Node and time limits for the search.
+
+    Returns
+    -------
+    int
+        Number of solutions, at most limit.
+
+    Raises
+    ------
+    SearchLimitException
+        If the budget runs out, its partial attribute holds the solutions counted so far.
+    """
+    return _bitmask_search(board, box_size, limit, budget=budget)[0]
+
+
+def random_solution(board, box_size=3, rng=np.random, budget=None):
+    """Finds a random solution of a board by trying candidates in random order.
+
+    Parameters
+    ----------
+    board : ndarray
+        Board array, it is not modified.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+    rng : numpy.random.Generator, optional
+        Source of randomness, defaults to the global numpy random state.
+    budget : Budget, optional
+        Node and time limits for the search.
+
+    Returns
+    -------
+    ndarray
+        Solved board.
+
+    Raises
+    ------
+    UnsolvableBoardException
+        If the board does not have a solution.
+    SearchLimitException
+        If the budget runs out.
+    """
+    solutions, solution = _bitmask_search(board, box_size, 1, rng, budget)
+    if solutions == 0:
+        raise util.UnsolvableBoardException
+    return solution
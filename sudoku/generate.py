@@ -1,75 +1,488 @@
-import os
-import sys
-sys.path.append('/'.join(os.path.abspath(__file__).split('/')[:-2]))
-from sudoku import util, dfs, deductive
+from sudoku import util, dfs
 import numpy as np
-from tqdm import tqdm
+import os
+
+
+FILL_METHODS = ('propagate', 'search')
+
+
+def _fill_propagate(state, ranks, digits, progress=None):
+    # randomized depth first fill, takes the empty cell with the fewest candidates (ties go to the lowest rank)
+    # and fills in naked singles after every placement, backs up when a cell runs out of candidates
+    side = len(ranks)
+    bits = np.arange(side)
+    stack = []
+    frame = None
+    filled = 0
+    while True:
+        if frame is None:
+            empty = state.board == 0
+            if not empty.any():
+                return state.board
+            counts = ((state.masks[:, :, None] >> bits) & 1).sum(axis=2)
+            (x, y) = divmod(int(np.argmin(np.where(empty, counts * side * side + ranks, side ** 4))), side)
+            frame = [x, y, 0, state.snapshot()]
+        (x, y, _, saved) = frame
+        placed = False
+        while frame[2] < side:
+            value = digits[x][y][frame[2]]
+            frame[2] += 1
+            if state.masks[x][y] >> (value - 1) & 1:
+                if state.place(x, y, value) and state.propagate():
+                    placed = True
+                    break
+                state.restore(saved)
+        if placed:
+            stack.append(frame)
+            frame = None
+            if progress is not None:
+                count = int(np.count_nonzero(state.board))
+                if count > filled:
+                    progress.update('fill_board', count - filled)
+                    filled = count
+            continue
+        if not stack:
+            raise util.UnsolvableBoardException
+        frame = stack.pop()
+        state.restore(frame[3])
 
 
-def fill_board():
-    code = '0' * 81
-    board = util.code_to_board(code)
+def fill_board(progress=None, box_size=3, method=None):
+    """Fills an empty board with a random valid solution.
 
-    guesses = util.generate_guess_list(board)
+    Cells are taken in a shuffled order and each cell tries its digits in a shuffled order.
+
+    Parameters
+    ----------
+    progress : ProgressHook, optional
+        Receives one 'fill_board' step per filled cell.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+    method : string, optional
+        'propagate' keeps the candidates of every cell between placements, fills in naked singles,
+        takes the cell with the fewest candidates next and backs up when a cell runs out of candidates.
+        'search' checks every tentative digit with a solution search, boards other than 9x9 use a
+        randomized search instead.
+        Defaults to the faster of the two, 'propagate' up to 16x16 and 'search' for larger boards.
+
+    Returns
+    -------
+    ndarray
+        Solved board.
+
+    Raises
+    ------
+    ValueError
+        If the method is unknown.
+    """
+    if method is None:
+        method = 'propagate' if box_size <= 4 else 'search'
+    if method not in FILL_METHODS:
+        raise ValueError(f'Unknown fill method {method}, expected one of {FILL_METHODS}')
+    side = box_size * box_size
+    code = '0' * side * side
+    board = util.code_to_board(code, box_size)
+    if box_size != 3 and method == 'search':
+        # the cell by cell fill below runs a search per tentative digit, which doesn't scale past 9x9
+        if progress is not None:
+            progress.start('fill_board', side * side)
+        board = dfs.random_solution(board, box_size)
+        if progress is not None:
+            progress.update('fill_board', side * side)
+            progress.close('fill_board')
+        return board
+
+    # same as util.generate_guess_list for an empty board
+    guesses = [{'x': x, 'y': y, 'guesses': list(range(1, side + 1))} for x in range(side) for y in range(side)]
     np.random.shuffle(guesses)
     for cell in guesses:
         np.random.shuffle(cell['guesses'])
-    # print(guesses)
-
-    pbar = tqdm(total=81)
-    while(len(guesses)):
-        pbar.update(1)
-        # while there are empty cells
-        random_cell = guesses.pop(0)
-        for tentative in random_cell['guesses']:
-            forward_valid = True
-            # for each guess in the cell, try it and see if it leads to a solution
-            board[random_cell['x']][random_cell['y']] = tentative
-            updated_guesses = []
-            # to update guesses, iterate over all of the old guesses and see if they have to be changed after inserting the new tentative guess
-            for old_guess in guesses:
-                new_guess = {'x': old_guess['x'], 'y': old_guess['y'], 'guesses': old_guess['guesses'][:]}  # creating a deep copy of the guess
-                if tentative in new_guess['guesses']:
-                    if new_guess['x'] == random_cell['x'] or new_guess['y'] == random_cell['y'] or (new_guess['x'] // 3 == random_cell['x'] // 3 and new_guess['y'] // 3 == random_cell['y'] // 3):
-                        new_guess['guesses'].remove(tentative)
-                        # forward checking
-                        if len(new_guess['guesses']) == 0:
-                            forward_valid = False
-                            break
-                updated_guesses.append(new_guess)
-
-            if forward_valid:
-                try:
-                    solution = dfs.dfs_from_board(np.copy(board))
-                    guesses = updated_guesses
-                    break  # break out of this tentative testing loop
-                except util.UnsolvableBoardException:
-                    board[random_cell['x']][random_cell['y']] = 0
-            else:
-                board[random_cell['x']][random_cell['y']] = 0
-    pbar.close()
+
+    if method == 'propagate':
+        if progress is not None:
+            progress.start('fill_board', side * side)
+        ranks = np.zeros((side, side), np.int64)
+        digits = [[None] * side for x in range(side)]
+        for rank, cell in enumerate(guesses):
+            ranks[cell['x']][cell['y']] = rank
+            digits[cell['x']][cell['y']] = cell['guesses']
+        try:
+            board = _fill_propagate(util.CandidateState(board, box_size), ranks, digits, progress)
+        finally:
+            if progress is not None:
+                progress.close('fill_board')
+        assert util.board_is_solved(board, box_size)
+        return board
+
+    if progress is not None:
+        progress.start('fill_board', 81)
+    state = util.CandidateState(board)
+    for cell in guesses:
+        if progress is not None:
+            progress.update('fill_board')
+        (x, y) = (cell['x'], cell['y'])
+        for tentative in cell['guesses']:
+            if not state.masks[x][y] >> (tentative - 1) & 1:
+                continue
+            # try the tentative digit, forward checking is done by the candidate state and the search checks it leads to a solution
+            saved = state.snapshot()
+            if state.place(x, y, tentative) and dfs.count_solutions(state.board, limit=1):
+                break
+            state.restore(saved)
+    if progress is not None:
+        progress.close('fill_board')
+    board = state.board
 
     assert util.board_is_solved(board)
     return board
 
 
-def generate(filled_board):
-    positions = [(util.to_x(i), util.to_y(i)) for i in range(81)]
-    np.random.shuffle(positions)
-    board = np.copy(filled_board)
-    for x, y in tqdm(positions):
-        temp = board[x][y]
-        board[x][y] = 0
-        if dfs.test_unique(np.copy(board)):
+# transforms take a position and the last coordinate on the board (8 for 9x9 boards)
+SYMMETRIES = {
+    'rotational': [lambda x, y, n: (n - x, n - y)],
+    'rotational4': [lambda x, y, n: (y, n - x)],
+    'horizontal': [lambda x, y, n: (x, n - y)],
+    'vertical': [lambda x, y, n: (n - x, y)],
+    'diagonal': [lambda x, y, n: (y, x)],
+    'mirror4': [lambda x, y, n: (x, n - y), lambda x, y, n: (n - x, y)],
+}
+
+
+def symmetry_orbits(symmetry=None, mask=None, box_size=3):
+    """Groups board positions into orbits that are removed together to keep a symmetric layout.
+
+    Parameters
+    ----------
+    symmetry : string, optional
+        One of the keys of SYMMETRIES: 'rotational' (180 degree turn), 'rotational4' (quarter turns),
+        'horizontal' or 'vertical' (mirror lines), 'diagonal' (transpose) or 'mirror4' (both mirror lines).
+        None gives one orbit per position.
+    mask : ndarray, optional
+        (side, side) boolean array, side = box_size ** 2, of positions that may be removed. Orbits with any position outside the mask are dropped.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+
+    Returns
+    -------
+    list
+        List of orbits, each a tuple of (x, y) positions.
+
+    Raises
+    ------
+    ValueError
+        If the symmetry is unknown.
+    """
+    if symmetry is not None and symmetry not in SYMMETRIES:
+        raise ValueError(f'Unknown symmetry {symmetry}, expected one of {list(SYMMETRIES)}')
+    transforms = SYMMETRIES[symmetry] if symmetry is not None else []
+    orbits = []
+    seen = set()
+    side = box_size * box_size
+    for i in range(side * side):
+        position = (util.to_x(i, box_size), util.to_y(i, box_size))
+        if position in seen:
             continue
-        else:
-            board[x][y] = temp
+        orbit = [position]
+        for (x, y) in orbit:
+            for transform in transforms:
+                image = transform(x, y, side - 1)
+                if image not in orbit:
+                    orbit.append(image)
+        seen.update(orbit)
+        if mask is not None and not all(mask[x][y] for (x, y) in orbit):
+            continue
+        orbits.append(tuple(orbit))
+    return orbits
+
+
+def unavoidable_sets(filled_board, box_size=3):
+    """Finds sets of cells of a solved board that can't all be removed without a second solution.
+
+    For every pair of digits the cells holding either digit are linked within each row, column and box.
+    Swapping the two digits over a connected group of these cells gives another valid board, so a
+    puzzle needs a clue in every group.
+
+    Parameters
+    ----------
+    filled_board : ndarray
+        Solved board.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+
+    Returns
+    -------
+    list
+        Sets as tuples of (x, y) positions, smallest first.
+    """
+    side = box_size * box_size
+    units = [[(x, y) for y in range(side)] for x in range(side)] + [[(x, y) for x in range(side)] for y in range(side)]
+    units += [[(bx * box_size + i // box_size, by * box_size + i % box_size) for i in range(side)]
+              for bx in range(box_size) for by in range(box_size)]
+    digit_units = []
+    for unit in units:
+        digit_units.append({int(filled_board[x][y]): (x, y) for (x, y) in unit})
+    sets = []
+    for a in range(1, side + 1):
+        for b in range(a + 1, side + 1):
+            links = {}
+            for cells in digit_units:
+                links.setdefault(cells[a], []).append(cells[b])
+                links.setdefault(cells[b], []).append(cells[a])
+            seen = set()
+            for start in links:
+                if start in seen:
+                    continue
+                group = [start]
+                seen.add(start)
+                for cell in group:
+                    for linked in links[cell]:
+                        if linked not in seen:
+                            seen.add(linked)
+                            group.append(linked)
+                sets.append(tuple(sorted(group)))
+    return sorted(sets, key=len)
+
+
+class _UnavoidableIndex:
+    # number of clues left in every unavoidable set, so removals that would empty one are rejected without a search
+
+    def __init__(self, sets, side):
+        self.cell_sets = [[[] for y in range(side)] for x in range(side)]
+        self.remaining = [len(cells) for cells in sets]
+        for i, cells in enumerate(sets):
+            for (x, y) in cells:
+                self.cell_sets[x][y].append(i)
+
+    def empties(self, cells):
+        hits = {}
+        for (x, y) in cells:
+            for i in self.cell_sets[x][y]:
+                hits[i] = hits.get(i, 0) + 1
+        return any(self.remaining[i] == count for i, count in hits.items())
+
+    def remove(self, cells):
+        for (x, y) in cells:
+            for i in self.cell_sets[x][y]:
+                self.remaining[i] -= 1
+
+
+class GenerationFailedException(Exception):
+    """Raised when no board matching the requested constraints could be generated."""
+    pass
+
+
+def _remove_speculative(board, orbits, clues, target_clues, progress, box_size, executor, batch_size, index_sets):
+    # tests the removals of the next orbits concurrently and commits them in orbit order, the board is the same
+    # as with one removal after the other. Each trial also removes the earlier orbits of its batch that are
+    # predicted to be accepted. More clues keep a board unique and fewer clues keep it ambiguous, so a unique
+    # trial holds if nothing outside the prediction was committed before it, an ambiguous one if all of the
+    # prediction was. Otherwise the removal is tested again in the next batch.
+    failed = set()
+    accepting = True  # early removals tend to be accepted, late ones rejected
+    reported = 0
+    index = 0
+    while index < len(orbits):
+        batch = []
+        predicted = {}
+        removed = []
+        remaining = clues
+        for j in range(index, len(orbits)):
+            if len(batch) == batch_size:
+                break
+            if j in failed or (target_clues is not None and remaining - len(orbits[j]) < target_clues):
+                continue
+            if index_sets.empties(orbits[j]):
+                failed.add(j)
+                continue
+            batch.append(j)
+            predicted[j] = set(removed)
+            if accepting:
+                removed.append(j)
+                remaining -= len(orbits[j])
+        trials = []
+        for j in batch:
+            trial = np.copy(board)
+            for k in predicted[j] | {j}:
+                for (x, y) in orbits[k]:
+                    trial[x][y] = 0
+            trials.append(trial)
+        results = dict(zip(batch, executor.map(dfs.test_unique, trials, [box_size] * len(trials))))
+
+        committed = set()
+        j = index
+        while j < len(orbits):
+            orbit = orbits[j]
+            if progress is not None and j >= reported:
+                progress.update('generate')
+                reported = j + 1
+            if target_clues is not None:
+                if clues <= target_clues:
+                    return board
+                if clues - len(orbit) < target_clues:
+                    j += 1
+                    continue
+            if j in failed or index_sets.empties(orbit):
+                failed.add(j)
+                j += 1
+                continue
+            if j not in results:
+                break
+            if results[j] and committed <= predicted[j]:
+                for (x, y) in orbit:
+                    board[x][y] = 0
+                clues -= len(orbit)
+                index_sets.remove(orbit)
+                committed.add(j)
+            elif not results[j] and predicted[j] <= committed:
+                failed.add(j)
+            else:
+                break
+            j += 1
+        failed.update(k for k in batch if k >= j and not results[k] and predicted[k] <= committed)
+        accepting = 2 * sum(results.values()) > len(results)
+        index = j
+    return board
+
+
+def generate(filled_board, symmetry=None, mask=None, target_clues=None, difficulty=None, progress=None, box_size=3,
+             executor=None, batch_size=None, estimate=False):
+    """Removes clues from a filled board while it keeps a unique solution.
+
+    Removals that would take the last clue out of one of the board's unavoidable sets are rejected
+    without a search, see unavoidable_sets.
+
+    Parameters
+    ----------
+    filled_board : ndarray
+        Solved board to remove clues from.
+    symmetry : string, optional
+        Removes clues in orbits under this symmetry, see symmetry_orbits.
+        Each orbit costs a single uniqueness check.
+    mask : ndarray, optional
+        (side, side) boolean array, side = box_size ** 2, of positions that may be removed, all other clues are kept.
+    target_clues : int, optional
+        Stops as soon as the board is down to this many clues.
+    difficulty : tuple, optional
+        (min, max) band for deductive.rate. Removals are only kept if the board still rates at most max,
+        a board that solves deductively is unique so no search is needed. Boards that can no longer reach
+        min, by deductive.difficulty_bound, are abandoned early.
+    progress : ProgressHook, optional
+        Receives one 'generate' step per tried orbit.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide. Difficulty bands need 9x9 boards.
+    executor : concurrent.futures.Executor, optional
+        Tests the removals of the next batch_size orbits concurrently, the removals are still committed
+        in orbit order so the board is the same as without an executor. Not supported with difficulty bands.
+    batch_size : int, optional
+        Number of removals tested at once, defaults to the number of cores.
+    estimate : bool
+        Also abandons boards that are not expected to reach the difficulty band by deductive.difficulty_estimate.
+        This heuristic gives up on hopeless bands much sooner, but it can drop boards that would have reached the band.
+
+    Returns
+    -------
+    ndarray or None
+        Board with a unique solution, or None if it wasn't brought into the difficulty band.
+
+    Raises
+    ------
+    ValueError
+        If a difficulty band is requested for a board that isn't 9x9, or together with an executor.
+    """
+    if difficulty is not None and box_size != 3:
+        raise ValueError('Difficulty bands are only supported for 9x9 boards')
+    if difficulty is not None and executor is not None:
+        raise ValueError('Difficulty bands can not be generated with an executor')
+    orbits = symmetry_orbits(symmetry, mask, box_size)
+    np.random.shuffle(orbits)
+    board = np.copy(filled_board)
+    clues = np.count_nonzero(board)
+    index_sets = _UnavoidableIndex(unavoidable_sets(board, box_size), box_size * box_size)
+    if difficulty is not None:
+        from sudoku import deductive
+        min_difficulty, max_difficulty = difficulty
+        rating = 0
+        max_empty = 81 - (target_clues or 0)
+        removable = np.cumsum([len(orbit) for orbit in orbits][::-1])[::-1]
+    if progress is not None:
+        progress.start('generate', len(orbits))
+    try:
+        if executor is not None:
+            return _remove_speculative(board, orbits, clues, target_clues, progress, box_size, executor, batch_size or os.cpu_count(), index_sets)
+        for index, orbit in enumerate(orbits):
+            if progress is not None:
+                progress.update('generate')
+            if target_clues is not None:
+                if clues <= target_clues:
+                    break
+                if clues - len(orbit) < target_clues:
+                    continue
+            if difficulty is not None and rating < min_difficulty:
+                reachable = deductive.difficulty_estimate if estimate else deductive.difficulty_bound
+                if reachable(min(max_empty, 81 - clues + removable[index])) < min_difficulty:
+                    return None
+            if index_sets.empties(orbit):
+                # the board would have a second solution, a rating needs a unique solution as well
+                continue
+            temp = [board[x][y] for (x, y) in orbit]
+            for (x, y) in orbit:
+                board[x][y] = 0
+            if difficulty is None:
+                accepted = dfs.test_unique(board, box_size)
+            else:
+                new_rating = deductive.rate(board, max_difficulty)
+                accepted = new_rating is not None
+                if accepted:
+                    rating = new_rating
+            if accepted:
+                clues -= len(orbit)
+                index_sets.remove(orbit)
+                continue
+            else:
+                for (x, y), value in zip(orbit, temp):
+                    board[x][y] = value
+    finally:
+        if progress is not None:
+            progress.close('generate')
+    if difficulty is not None and rating < min_difficulty:
+        return None
     return board
 
 
+def generate_graded(difficulty, attempts=20, symmetry=None, mask=None, target_clues=None, progress=None):
+    """Generates a board whose deductive.rate falls in a difficulty band.
+
+    Parameters
+    ----------
+    difficulty : tuple
+        (min, max) difficulty band.
+    attempts : int
+        Number of filled boards to try before giving up.
+    symmetry, mask, target_clues, progress
+        Passed on to fill_board and generate.
+
+    Returns
+    -------
+    ndarray
+        Board with a unique solution and a rating within the band.
+
+    Raises
+    ------
+    GenerationFailedException
+        If none of the attempts landed in the band.
+    """
+    for attempt in range(attempts):
+        board = generate(fill_board(progress), symmetry, mask, target_clues, difficulty, progress)
+        if board is not None:
+            return board
+    raise GenerationFailedException(f'No board rated within {difficulty} after {attempts} attempts')
+
+
 if __name__ == "__main__":
-    filled = fill_board()
+    from sudoku.progress import TqdmHook
+    progress = TqdmHook()
+    filled = fill_board(progress)
     print(util.board_to_code(filled))
-    board = generate(filled)
+    board = generate(filled, progress=progress)
     util.print_board(board)
     print(util.board_to_code(board))
@@ -0,0 +1,364 @@
+"""Sharded, resumable bulk generation jobs.
+
+A job directory holds the job spec in job.json and one set of files per shard in shards/:
+the puzzles (NNNNN.txt), a checkpoint written once they are complete (NNNNN.done) and a claim
+taken by the worker generating them (NNNNN.claim). Outputs and checkpoints are written to a
+temporary file and moved into place, so a crash never leaves a partial shard behind, and claims
+are created exclusively, so workers on several hosts sharing the directory never take the same shard.
+Workers touch their claims while generating, a claim that stops being touched, or whose process is
+gone from the host, is taken over by the next worker.
+
+Run ``python -m sudoku.jobs init DIR --count N`` once, ``python -m sudoku.jobs run DIR`` on every
+worker and ``python -m sudoku.jobs merge DIR OUT`` when all shards are done.
+"""
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+
+SPEC_FILE = 'job.json'
+SHARD_DIR = 'shards'
+# seconds without a heartbeat after which a claim is taken over, and between heartbeats without a timeout
+STALE_AFTER = 60.0
+HEARTBEAT = 15.0
+
+
+class IncompleteJobException(Exception):
+    """Raised when merging a job that still has shards to generate."""
+    pass
+
+
+def _write_atomic(path, data):
+    # writes to a temporary file in the same directory and renames it over the target
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(handle, 'w') as temp_file:
+            temp_file.write(data)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _shard_path(directory, index, extension):
+    return os.path.join(directory, SHARD_DIR, f'{index:05d}.{extension}')
+
+
+def create_job(directory, count, shard_size=100, seed=0, symmetry=None, target_clues=None, box_size=3):
+    """Creates a job directory that splits the generation of count puzzles into seeded shards.
+
+    Parameters
+    ----------
+    directory : string
+        Directory to create the job in.
+    count : int
+        Total number of puzzles.
+    shard_size : int
+        Number of puzzles per shard, the last shard takes the rest.
+    seed : int
+        Seed of the job, every shard gets its own seed derived from it.
+    symmetry, target_clues, box_size
+        Passed on to generate.fill_board and generate.generate.
+
+    Returns
+    -------
+    dict
+        Job spec.
+
+    Raises
+    ------
+    FileExistsError
+        If the directory already holds a job.
+    """
+    os.makedirs(os.path.join(directory, SHARD_DIR), exist_ok=True)
+    if os.path.exists(os.path.join(directory, SPEC_FILE)):
+        raise FileExistsError(f'{directory} already holds a job')
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(-(-count // shard_size))]
+    shards = [{'index': i, 'seed': shard_seed, 'count': min(shard_size, count - i * shard_size)} for i, shard_seed in enumerate(seeds)]
+    spec = {
+        'count': count,
+        'seed': seed,
+        'options': {'symmetry': symmetry, 'target_clues': target_clues, 'box_size': box_size},
+        'shards': shards,
+    }
+    _write_atomic(os.path.join(directory, SPEC_FILE), json.dumps(spec, indent=2))
+    return spec
+
+
+def load_job(directory):
+    """Reads the job spec of a job directory.
+
+    Parameters
+    ----------
+    directory : string
+
+    Returns
+    -------
+    dict
+        Job spec.
+    """
+    with open(os.path.join(directory, SPEC_FILE)) as spec_file:
+        return json.load(spec_file)
+
+
+def generate_shard(shard, symmetry=None, target_clues=None, box_size=3):
+    """Generates the puzzles of a shard, the same shard always gives the same puzzles.
+
+    Parameters
+    ----------
+    shard : dict
+        Shard from the job spec.
+    symmetry, target_clues, box_size
+        Passed on to generate.fill_board and generate.generate.
+
+    Returns
+    -------
+    list
+        Lines of puzzle code and solution code separated by a space.
+    """
+    from sudoku import util, generate
+    np.random.seed(shard['seed'])
+    lines = []
+    for i in range(shard['count']):
+        filled = generate.fill_board(box_size=box_size)
+        board = generate.generate(filled, symmetry, target_clues=target_clues, box_size=box_size)
+        lines.append(f'{util.board_to_code(board, box_size)} {util.board_to_code(filled, box_size)}')
+    return lines
+
+
+def _read_claim(path):
+    # contents and modification time of a claim, None if there is no claim
+    try:
+        with open(path) as claim_file:
+            data = claim_file.read()
+            mtime = os.fstat(claim_file.fileno()).st_mtime
+    except FileNotFoundError:
+        return None
+    try:
+        owner = json.loads(data)
+    except ValueError:
+        owner = {}
+    return data, owner if isinstance(owner, dict) else {}, mtime
+
+
+def _is_abandoned(owner, mtime, stale_after):
+    # claims whose heartbeat stopped, or whose process is gone from this host
+    if stale_after is not None and time.time() - mtime > stale_after:
+        return True
+    if owner.get('host') == socket.gethostname() and isinstance(owner.get('pid'), int):
+        try:
+            os.kill(owner['pid'], 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+    return False
+
+
+def _claim(directory, index, worker, token, stale_after):
+    path = _shard_path(directory, index, 'claim')
+    claim = _read_claim(path)
+    if claim is not None and _is_abandoned(*claim[1:], stale_after):
+        # moves the claim aside first, only one worker can rename it, and puts it back if
+        # it turns out to be a fresh claim taken between the check and the rename
+        aside = f'{path}.{token}'
+        try:
+            os.rename(path, aside)
+        except FileNotFoundError:
+            return False
+        moved = _read_claim(aside)
+        if moved[0] != claim[0] or not _is_abandoned(*moved[1:], stale_after):
+            try:
+                os.link(aside, path)
+            except FileExistsError:
+                pass
+            os.remove(aside)
+            return False
+        os.remove(aside)
+    try:
+        handle = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(handle, 'w') as claim_file:
+        claim_file.write(json.dumps({'worker': worker, 'host': socket.gethostname(), 'pid': os.getpid(),
+                                     'token': token, 'time': time.time()}))
+    return True
+
+
+def _owns_claim(path, token):
+    claim = _read_claim(path)
+    return claim is not None and claim[1].get('token') == token
+
+
+def _release(directory, index, token):
+    # removes the claim unless another worker took it over, which keeps its claim
+    path = _shard_path(directory, index, 'claim')
+    if _owns_claim(path, token):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _heartbeat(path, token, interval, stop):
+    # touches the claim while the shard is generated, so other workers don't take it over
+    while not stop.wait(interval):
+        if not _owns_claim(path, token):
+            return
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return
+
+
+def run_job(directory, worker=None, stale_after=STALE_AFTER, max_shards=None):
+    """Generates the shards of a job that are neither done nor claimed by another worker.
+
+    Parameters
+    ----------
+    directory : string
+        Job directory.
+    worker : string, optional
+        Name written to the claim files, defaults to host name and process id.
+    stale_after : float, optional
+        Seconds without a heartbeat after which another worker's claim counts as abandoned and is
+        taken over, workers touch their claim several times within this interval. When None, only
+        claims of processes that are gone from this host are taken over.
+    max_shards : int, optional
+        Stops after generating this many shards.
+
+    Returns
+    -------
+    list
+        Indices of the shards generated by this call.
+    """
+    spec = load_job(directory)
+    worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+    token = uuid.uuid4().hex
+    interval = HEARTBEAT if stale_after is None else max(stale_after / 4, 0.05)
+    generated = []
+    for shard in spec['shards']:
+        if max_shards is not None and len(generated) >= max_shards:
+            break
+        index = shard['index']
+        if os.path.exists(_shard_path(directory, index, 'done')):
+            continue
+        if not _claim(directory, index, worker, token, stale_after):
+            continue
+        if os.path.exists(_shard_path(directory, index, 'done')):
+            # finished by another worker between the check and the claim
+            _release(directory, index, token)
+            continue
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat, args=(_shard_path(directory, index, 'claim'), token, interval, stop), daemon=True)
+        heartbeat.start()
+        try:
+            start = time.time()
+            lines = generate_shard(shard, **spec['options'])
+            _write_atomic(_shard_path(directory, index, 'txt'), ''.join(line + '\n' for line in lines))
+            checkpoint = {'index': index, 'seed': shard['seed'], 'count': len(lines), 'worker': worker, 'seconds': time.time() - start}
+            _write_atomic(_shard_path(directory, index, 'done'), json.dumps(checkpoint))
+        finally:
+            stop.set()
+            heartbeat.join()
+        _release(directory, index, token)
+        generated.append(index)
+    return generated
+
+
+def job_status(directory):
+    """Counts the shards of a job by state.
+
+    Parameters
+    ----------
+    directory : string
+
+    Returns
+    -------
+    dict
+        Numbers of 'done', 'claimed' and 'pending' shards.
+    """
+    status = {'done': 0, 'claimed': 0, 'pending': 0}
+    for shard in load_job(directory)['shards']:
+        if os.path.exists(_shard_path(directory, shard['index'], 'done')):
+            status['done'] += 1
+        elif os.path.exists(_shard_path(directory, shard['index'], 'claim')):
+            status['claimed'] += 1
+        else:
+            status['pending'] += 1
+    return status
+
+
+def merge_job(directory, output):
+    """Concatenates the shards of a finished job into one file in shard order.
+
+    Parameters
+    ----------
+    directory : string
+        Job directory.
+    output : string
+        Path of the merged file, written atomically.
+
+    Returns
+    -------
+    int
+        Number of puzzles written.
+
+    Raises
+    ------
+    IncompleteJobException
+        If some shards are not done yet.
+    """
+    spec = load_job(directory)
+    missing = [shard['index'] for shard in spec['shards'] if not os.path.exists(_shard_path(directory, shard['index'], 'done'))]
+    if missing:
+        raise IncompleteJobException(f'{len(missing)} of {len(spec["shards"])} shards are not done, first missing shard {missing[0]}')
+    parts = []
+    for shard in spec['shards']:
+        with open(_shard_path(directory, shard['index'], 'txt')) as shard_file:
+            parts.append(shard_file.read())
+    _write_atomic(os.path.abspath(output), ''.join(parts))
+    return spec['count']
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    init_parser = commands.add_parser('init', help='create a job directory')
+    init_parser.add_argument('directory')
+    init_parser.add_argument('--count', type=int, required=True)
+    init_parser.add_argument('--shard-size', type=int, default=100)
+    init_parser.add_argument('--seed', type=int, default=0)
+    init_parser.add_argument('--symmetry')
+    init_parser.add_argument('--target-clues', type=int)
+    init_parser.add_argument('--box-size', type=int, default=3)
+    run_parser = commands.add_parser('run', help='generate unclaimed shards')
+    run_parser.add_argument('directory')
+    run_parser.add_argument('--worker')
+    run_parser.add_argument('--stale-after', type=float, default=STALE_AFTER)
+    run_parser.add_argument('--max-shards', type=int)
+    status_parser = commands.add_parser('status', help='count shards by state')
+    status_parser.add_argument('directory')
+    merge_parser = commands.add_parser('merge', help='merge finished shards into one file')
+    merge_parser.add_argument('directory')
+    merge_parser.add_argument('output')
+    args = parser.parse_args()
+
+    if args.command == 'init':
+        spec = create_job(args.directory, args.count, args.shard_size, args.seed, args.symmetry, args.target_clues, args.box_size)
+        print(f'created {len(spec["shards"])} shards in {args.directory}')
+    elif args.command == 'run':
+        print(f'generated shards {run_job(args.directory, args.worker, args.stale_after, args.max_shards)}')
+    elif args.command == 'status':
+        print(json.dumps(job_status(args.directory)))
+    else:
+        print(f'merged {merge_job(args.directory, args.output)} puzzles into {args.output}')
@@ -0,0 +1,433 @@
+"""Solution counting and batch solving split across a process pool.
+
+The search tree is cut at the cells with the fewest candidates into independent subproblems,
+which are handed to the workers one at a time so fast subtrees don't leave workers idle.
+
+Batches of boards travel through shared memory: the boards and the results are arrays that every
+worker maps, so only block names and index ranges are sent to the workers instead of pickled boards and results.
+"""
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from sudoku import util, dfs
+
+_stop = None
+_attached = {}
+_barrier = None
+
+
+def _init_worker(stop):
+    global _stop
+    _stop = stop
+
+
+def _budget(max_nodes, deadline, event=None):
+    # deadlines cross process boundaries as wall clock times
+    return util.Budget(max_nodes, None if deadline is None else max(0, deadline - time.time()), event)
+
+
+def _count_subproblem(args):
+    # returns the solutions counted, the nodes visited and whether the budget ran out
+    board, box_size, limit, max_nodes, deadline = args
+    if _stop.is_set():
+        return 0, 0, False
+    budget = _budget(max_nodes, deadline, _stop)
+    try:
+        return dfs.count_solutions(board, box_size, limit, budget), budget.nodes, False
+    except util.SearchLimitException as err:
+        return err.partial or 0, budget.nodes, not _stop.is_set()
+
+
+def split_board(board, box_size=3, parts=64):
+    """Splits the solutions of a board into independent subproblems.
+
+    Boards are expanded a level at a time, each level fixes the empty cell with the fewest candidates
+    to every candidate it has. Branches that leave a cell without candidates are dropped.
+
+    Parameters
+    ----------
+    board : ndarray
+        Board array, it is not modified.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+    parts : int
+        Expands until there are at least this many subproblems, or every board is full.
+
+    Returns
+    -------
+    list
+        Boards whose solutions together are exactly the solutions of the board.
+    """
+    side = box_size * box_size
+    bits = np.arange(side)
+    frontier = [np.array(board, np.int8)]
+    while 0 < len(frontier) < parts:
+        expanded = []
+        split = False
+        for part in frontier:
+            empty = part == 0
+            if not empty.any():
+                expanded.append(part)
+                continue
+            masks = util.candidate_masks(part, box_size)
+            counts = np.where(empty, ((masks[:, :, None] >> bits) & 1).sum(axis=2), side + 1)
+            (x, y) = divmod(int(np.argmin(counts)), side)
+            split = True
+            for z in range(side):
+                if masks[x][y] >> z & 1:
+                    child = part.copy()
+                    child[x][y] = z + 1
+                    expanded.append(child)
+        frontier = expanded
+        if not split:
+            break
+    return frontier
+
+
+def count_solutions(board, box_size=3, limit=None, processes=None, parts=None, max_nodes=None, timeout=None):
+    """Counts the solutions of a board on a process pool.
+
+    Parameters
+    ----------
+    board : ndarray
+        Board array, it is not modified.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+    limit : int, optional
+        Stops all workers once this many solutions are found.
+    processes : int, optional
+        Number of worker processes, defaults to the number of cores.
+    parts : int, optional
+        Number of subproblems to split the search into, defaults to 16 per worker.
+    max_nodes : int, optional
+        Node limit for all subproblems together, checked as subproblems finish. A single
+        subproblem stops once it reaches the limit on its own.
+    timeout : float, optional
+        Time limit in seconds for the whole count.
+
+    Returns
+    -------
+    int
+        Number of solutions, at most limit.
+
+    Raises
+    ------
+    SearchLimitException
+        If the node or time limit is reached, its partial attribute holds the solutions counted so far.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    deadline = None if timeout is None else time.time() + timeout
+    subproblems = split_board(board, box_size, parts or 16 * processes)
+    tasks = [(part, box_size, limit, max_nodes, deadline) for part in subproblems]
+    stop = multiprocessing.Event()
+    total = nodes = 0
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(stop,)) as pool:
+        for count, visited, limited in pool.imap_unordered(_count_subproblem, tasks):
+            total += count
+            nodes += visited
+            if limit is not None and total >= limit:
+                stop.set()
+                break
+            if limited or (max_nodes is not None and nodes > max_nodes):
+                stop.set()
+                raise util.SearchLimitException(f'Parallel count stopped after {nodes} nodes', total)
+    return total if limit is None else min(total, limit)
+
+
+class SharedBoards:
+    """Array in shared memory that other processes can map without copying.
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape of the array, e.g. (N, 81) for N flat boards.
+    dtype : numpy dtype
+        Element type, boards use uint8.
+    name : string, optional
+        Name of an existing block to attach to, a new zeroed block is created when not given.
+
+    Attributes
+    ----------
+    array : ndarray
+        View of the shared block.
+    """
+
+    def __init__(self, shape, dtype=np.uint8, name=None):
+        self.owner = name is None
+        size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            try:
+                # the creating process frees the block, attached processes must not track it
+                self.memory = shared_memory.SharedMemory(name, track=False)
+            except TypeError:
+                # before Python 3.13 pool workers share the creator's resource tracker, which already holds the block
+                self.memory = shared_memory.SharedMemory(name)
+        self.array = np.ndarray(shape, dtype, buffer=self.memory.buf)
+        if self.owner:
+            self.array.fill(0)
+
+    @property
+    def spec(self):
+        """(name, shape, dtype) tuple to attach to the block from another process."""
+        return self.memory.name, self.array.shape, self.array.dtype.str
+
+    @classmethod
+    def attach(cls, spec):
+        """Maps a block created by another process.
+
+        Parameters
+        ----------
+        spec : tuple
+            spec attribute of the creating SharedBoards.
+
+        Returns
+        -------
+        SharedBoards
+        """
+        name, shape, dtype = spec
+        return cls(shape, dtype, name)
+
+    def close(self):
+        """Unmaps the block, the creating process also frees it."""
+        if self.memory is None:
+            return
+        self.array = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+        self.memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _init_batch_worker(barrier):
+    global _barrier
+    _barrier = barrier
+
+
+def _detach(names):
+    # unmaps replaced blocks, waiting on the barrier makes every worker take exactly one of these tasks
+    for name in names:
+        if name in _attached:
+            _attached.pop(name).close()
+    _barrier.wait()
+    return sorted(_attached)
+
+
+def _attach(specs):
+    # maps the blocks of a task, blocks of earlier batches that are no longer used are unmapped
+    names = [spec[0] for spec in specs]
+    for name in [name for name in _attached if name not in names]:
+        _attached.pop(name).close()
+    for spec in specs:
+        if spec[0] not in _attached:
+            _attached[spec[0]] = SharedBoards.attach(spec)
+    return [_attached[name] for name in names]
+
+
+def _process_range(args):
+    operation, specs, box_size, start, stop, max_nodes, timeout = args
+    boards, output, results = _attach(specs)
+    side = box_size * box_size
+    for i in range(start, stop):
+        board = boards.array[i].reshape(side, side).astype(np.int8)
+        budget = None
+        if max_nodes is not None or timeout is not None:
+            budget = util.Budget(max_nodes, timeout)
+        if operation == 'solve':
+            try:
+                output.array[i] = dfs.solve_board(board, box_size, budget).ravel()
+                results.array[i] = 1
+            except (util.UnsolvableBoardException, util.SearchLimitException) as err:
+                output.array[i] = 0
+                results.array[i] = -1 if isinstance(err, util.SearchLimitException) else 0
+        else:
+            from sudoku import deductive
+            if budget is not None:
+                # rating moves are few and slow, look at the clock on every one
+                budget.check_interval = 1
+            try:
+                rating = deductive.rate(board, budget=budget)
+                results.array[i] = -1 if rating is None else rating
+            except util.SearchLimitException:
+                results.array[i] = -2
+    return stop - start
+
+
+class BatchPool:
+    """Worker pool that solves and rates batches of boards through shared memory.
+
+    The pool and its shared blocks are kept between batches, the workers map the blocks the first
+    time a task names them, so a batch costs one copy of the boards into shared memory (none for
+    boards already in a SharedBoards) and one small message per index range. Blocks are grown when
+    a batch doesn't fit, every worker unmaps the old ones before they are freed.
+
+    Parameters
+    ----------
+    processes : int, optional
+        Number of worker processes, defaults to the number of cores.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.pool = None
+        self.input = None
+        self.output = None
+        self.results = None
+
+    def _fit(self, block, shape, dtype, replaced):
+        # block holding shape, grown to at least twice its old length when it doesn't fit
+        if block is not None and block.array.shape[1:] == shape[1:] and len(block.array) >= shape[0]:
+            return block
+        capacity = shape[0]
+        if block is not None:
+            capacity = max(capacity, 2 * len(block.array))
+            replaced.append(block)
+        return SharedBoards((capacity,) + shape[1:], dtype)
+
+    def _reserve(self, count, cells, copy):
+        # output boards, results and, when the boards are copied, input boards
+        replaced = []
+        if copy:
+            self.input = self._fit(self.input, (count, cells), np.uint8, replaced)
+        self.output = self._fit(self.output, (count, cells), np.uint8, replaced)
+        self.results = self._fit(self.results, (count,), np.int32, replaced)
+        if replaced:
+            self._release(replaced)
+
+    def _release(self, blocks):
+        # makes every worker unmap the blocks before they are freed, returns the names each worker still maps
+        attached = []
+        if self.pool is not None:
+            names = [block.spec[0] for block in blocks]
+            attached = self.pool.map(_detach, [names] * self.processes, chunksize=1)
+        for block in blocks:
+            block.close()
+        return attached
+
+    def _run(self, operation, boards, box_size, chunk_size, max_nodes, timeout):
+        cells = box_size ** 4
+        if isinstance(boards, SharedBoards):
+            count = len(boards.array)
+            self._reserve(count, cells, False)
+            source = boards
+        else:
+            if len(boards) and isinstance(boards[0], str):
+                boards = util.codes_to_boards(boards, box_size)
+            count = len(boards)
+            self._reserve(count, cells, True)
+            source = self.input
+            source.array[:count] = np.asarray(boards).reshape(count, cells)
+        (output, results) = (self.output, self.results)
+        if self.pool is None:
+            barrier = multiprocessing.Barrier(self.processes)
+            self.pool = multiprocessing.Pool(self.processes, initializer=_init_batch_worker, initargs=(barrier,))
+        specs = (source.spec, output.spec, results.spec)
+        chunk_size = chunk_size or max(1, -(-count // (4 * self.processes)))
+        ranges = [(operation, specs, box_size, start, min(start + chunk_size, count), max_nodes, timeout)
+                  for start in range(0, count, chunk_size)]
+        for done in self.pool.imap_unordered(_process_range, ranges):
+            pass
+        return output.array[:count], results.array[:count]
+
+    def solve(self, boards, box_size=3, chunk_size=None, max_nodes=None, timeout=None):
+        """Solves a batch of boards.
+
+        Parameters
+        ----------
+        boards : list, ndarray or SharedBoards
+            Board codes, a stack of boards of shape (N, side, side) or (N, side * side), or boards that
+            already live in shared memory, which are then not copied.
+        box_size : int
+            Width of a box, the board is box_size ** 2 cells wide.
+        chunk_size : int, optional
+            Number of boards per task, defaults to a quarter of each worker's share.
+        max_nodes : int, optional
+            Node limit for each board's search.
+        timeout : float, optional
+            Time limit in seconds for each board's search.
+
+        Returns
+        -------
+        tuple
+            (solutions, solved): uint8 array of shape (N, side * side) holding the solutions as flat boards,
+            and an int32 array of shape (N,) that is 1 for solved boards, 0 for boards without a solution and
+            -1 for boards whose search ran out of its budget, whose rows in solutions are zero. Both are views
+            of the pool's shared blocks, valid until the next batch, copy them to keep them.
+        """
+        return self._run('solve', boards, box_size, chunk_size, max_nodes, timeout)
+
+    def rate(self, boards, chunk_size=None, max_nodes=None, timeout=None):
+        """Rates a batch of 9x9 boards with deductive.rate.
+
+        Parameters
+        ----------
+        boards : list, ndarray or SharedBoards
+            Board codes, a stack of boards of shape (N, 9, 9) or (N, 81), or boards in shared memory.
+        chunk_size : int, optional
+            Number of boards per task, defaults to a quarter of each worker's share.
+        max_nodes : int, optional
+            Move limit for each board.
+        timeout : float, optional
+            Time limit in seconds for each board.
+
+        Returns
+        -------
+        ndarray
+            int32 view of shape (N,) with the rating of each board, -1 for boards the techniques can't solve
+            and -2 for boards that ran out of their budget, valid until the next batch.
+        """
+        return self._run('rate', boards, 3, chunk_size, max_nodes, timeout)[1]
+
+    def close(self):
+        """Stops the workers and frees the shared blocks."""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        for block in (self.input, self.output, self.results):
+            if block is not None:
+                block.close()
+        self.input = self.output = self.results = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def solve_boards(boards, box_size=3, processes=None, chunk_size=None, max_nodes=None, timeout=None):
+    """Solves a batch of boards on a one-off BatchPool, see BatchPool.solve.
+
+    Use a BatchPool directly for a stream of batches, it keeps its workers and shared blocks.
+
+    Returns
+    -------
+    tuple
+        (solutions, solved) arrays, copied out of shared memory.
+    """
+    with BatchPool(processes) as pool:
+        return tuple(np.array(array) for array in pool.solve(boards, box_size, chunk_size, max_nodes, timeout))
+
+
+def rate_boards(boards, processes=None, chunk_size=None, max_nodes=None, timeout=None):
+    """Rates a batch of 9x9 boards on a one-off BatchPool, see BatchPool.rate.
+
+    Returns
+    -------
+    ndarray
+        Ratings, -1 for boards the techniques can't solve and -2 for boards over the budget,
+        copied out of shared memory.
+    """
+    with BatchPool(processes) as pool:
+        return np.array(pool.rate(boards, chunk_size, max_nodes, timeout))
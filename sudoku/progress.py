@@ -0,0 +1,115 @@
+"""Progress and metrics hooks for long running library loops.
+
+Library functions take an optional hook and skip every progress call when none is given,
+so the hot loops pay nothing for progress reporting by default.
+"""
+
+
+class ProgressHook:
+    """Base progress hook, every method is a no-op.
+
+    A stage is a named loop such as 'fill_board' or 'generate'.
+    """
+
+    def start(self, stage, total):
+        """Called once before a stage runs.
+
+        Parameters
+        ----------
+        stage : string
+            Name of the stage.
+        total : int
+            Number of steps the stage will take at most.
+        """
+        pass
+
+    def update(self, stage, n=1):
+        """Called after every step of a stage.
+
+        Parameters
+        ----------
+        stage : string
+            Name of the stage.
+        n : int
+            Number of steps completed.
+        """
+        pass
+
+    def close(self, stage):
+        """Called once after a stage finishes, including early exits.
+
+        Parameters
+        ----------
+        stage : string
+            Name of the stage.
+        """
+        pass
+
+
+class TqdmHook(ProgressHook):
+    """Shows a tqdm progress bar per running stage, tqdm is only imported once a stage starts.
+
+    Parameters
+    ----------
+    **tqdm_kwargs
+        Passed on to every tqdm bar.
+    """
+
+    def __init__(self, **tqdm_kwargs):
+        self.tqdm_kwargs = tqdm_kwargs
+        self.bars = {}
+
+    def start(self, stage, total):
+        from tqdm import tqdm
+        self.bars[stage] = tqdm(total=total, desc=stage, **self.tqdm_kwargs)
+
+    def update(self, stage, n=1):
+        self.bars[stage].update(n)
+
+    def close(self, stage):
+        self.bars.pop(stage).close()
+
+
+class CounterHook(ProgressHook):
+    """Aggregates stage counters across the processes of a worker pool.
+
+    Counters live in shared memory, so the hook has to reach workers by inheritance,
+    e.g. through the initializer arguments of a multiprocessing.Pool.
+
+    Parameters
+    ----------
+    stages : iterable
+        Names of the stages to count, other stages are ignored.
+    """
+
+    fields = ('started', 'steps', 'finished')
+
+    def __init__(self, stages=('fill_board', 'generate')):
+        import multiprocessing
+        self.counters = {stage: {field: multiprocessing.Value('q', 0) for field in self.fields} for stage in stages}
+
+    def _add(self, stage, field, n):
+        counters = self.counters.get(stage)
+        if counters is None:
+            return
+        with counters[field].get_lock():
+            counters[field].value += n
+
+    def start(self, stage, total):
+        self._add(stage, 'started', 1)
+
+    def update(self, stage, n=1):
+        self._add(stage, 'steps', n)
+
+    def close(self, stage):
+        self._add(stage, 'finished', 1)
+
+    def counts(self):
+        """Reads the current counters.
+
+        Returns
+        -------
+        dict
+            Maps each stage to a dict of 'started', 'steps' and 'finished' counts.
+        """
+        return {stage: {field: counters[field].value for field in self.fields} for stage, counters in self.counters.items()}
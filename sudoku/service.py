@@ -0,0 +1,363 @@
+"""Asyncio front end for the solvers that coalesces requests into micro-batches for a worker pool.
+
+Run a local stand-in HTTP server with ``python -m sudoku.service serve`` and drive it with
+``python -m sudoku.service load``.
+"""
+import asyncio
+import json
+import time
+
+OPERATIONS = ('solve', 'unique')
+
+# queued by close, the batching task dispatches the batch it is filling and stops when it gets it
+_CLOSE = object()
+
+
+def solve_batch(requests, box_size=3, max_nodes=None, timeout=None):
+    """Solves a batch of requests, runs inside a worker process.
+
+    Parameters
+    ----------
+    requests : list
+        List of (operation, board code) tuples, operation is 'solve' or 'unique'.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+    max_nodes : int, optional
+        Node limit for each request's search.
+    timeout : float, optional
+        Time limit in seconds for each request's search.
+
+    Returns
+    -------
+    list
+        One (ok, value) tuple per request, value is the result or the raised exception.
+    """
+    from sudoku import util, dfs
+    results = []
+    for operation, code in requests:
+        budget = None
+        if max_nodes is not None or timeout is not None:
+            budget = util.Budget(max_nodes, timeout)
+        try:
+            if operation == 'solve':
+                results.append((True, dfs.dfs_bitmask(code, box_size, budget)))
+            elif operation == 'unique':
+                results.append((True, dfs.test_unique(util.code_to_board(code, box_size), box_size, budget)))
+            else:
+                raise ValueError(f'Unknown operation {operation}, expected one of {OPERATIONS}')
+        except Exception as err:
+            results.append((False, err))
+    return results
+
+
+class BatchSolver:
+    """Queues puzzle requests from coroutines and resolves them in micro-batches.
+
+    A batch is dispatched once it holds max_batch_size requests or its first request has waited
+    max_wait seconds, whichever comes first. Batching keeps running while earlier batches are solved.
+
+    Parameters
+    ----------
+    max_batch_size : int
+        Largest number of requests sent to a worker at once.
+    max_wait : float
+        Longest time in seconds a request waits for its batch to fill up.
+    executor : concurrent.futures.Executor, optional
+        Runs the batches, defaults to a ProcessPoolExecutor owned by the solver.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+    max_nodes : int, optional
+        Node limit for each request's search, requests over it raise SearchLimitException.
+    timeout : float, optional
+        Time limit in seconds for each request's search.
+    """
+
+    def __init__(self, max_batch_size=64, max_wait=0.005, executor=None, box_size=3, max_nodes=None, timeout=None):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor
+        self.owns_executor = executor is None
+        self.box_size = box_size
+        self.max_nodes = max_nodes
+        self.timeout = timeout
+        self.stats = {'requests': 0, 'batches': 0}
+        self.queue = None
+        self.batcher = None
+        self.pending = set()
+
+    async def start(self):
+        """Starts the batching task, called by the async context manager."""
+        if self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor()
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.get_running_loop().create_task(self._batch_loop())
+
+    async def close(self):
+        """Dispatches the requests queued so far and waits for their batches, then stops the batching
+        task and the owned executor. New requests are refused once closing starts."""
+        if self.batcher is None:
+            return
+        batcher = self.batcher
+        self.batcher = None
+        self.queue.put_nowait(_CLOSE)
+        await batcher
+        while not self.queue.empty():
+            self.queue.get_nowait()[2].cancel()
+        if self.pending:
+            await asyncio.gather(*self.pending, return_exceptions=True)
+        if self.owns_executor:
+            self.executor.shutdown()
+            self.executor = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def solve(self, code):
+        """Solves a board code.
+
+        Parameters
+        ----------
+        code : string
+            Board code listed from top left to bottom right.
+
+        Returns
+        -------
+        string
+            Board code for solved board.
+
+        Raises
+        ------
+        UnsolvableBoardException
+            If the board does not have a solution.
+        InvalidBoardException
+            If the board code is invalid.
+        SearchLimitException
+            If the search runs out of its node or time limit.
+        """
+        return await self.submit('solve', code)
+
+    async def is_unique(self, code):
+        """Checks whether a board code has exactly one solution.
+
+        Parameters
+        ----------
+        code : string
+            Board code listed from top left to bottom right.
+
+        Returns
+        -------
+        bool
+            Whether the board has a unique solution.
+        """
+        return await self.submit('unique', code)
+
+    async def submit(self, operation, code):
+        """Queues a request and waits for its batch to be solved.
+
+        Parameters
+        ----------
+        operation : string
+            'solve' or 'unique'.
+        code : string
+            Board code listed from top left to bottom right.
+
+        Returns
+        -------
+        string or bool
+            Result of the operation.
+        """
+        if self.batcher is None:
+            raise RuntimeError('BatchSolver is not running')
+        if operation not in OPERATIONS:
+            raise ValueError(f'Unknown operation {operation}, expected one of {OPERATIONS}')
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((operation, code, future))
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            item = await self.queue.get()
+            if item is _CLOSE:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self.queue.empty():
+                    item = self.queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _CLOSE:
+                    closing = True
+                    break
+                batch.append(item)
+            batch = [item for item in batch if not item[2].cancelled()]
+            if not batch:
+                continue
+            self.stats['requests'] += len(batch)
+            self.stats['batches'] += 1
+            task = loop.create_task(self._dispatch(batch))
+            self.pending.add(task)
+            task.add_done_callback(self.pending.discard)
+
+    async def _dispatch(self, batch):
+        loop = asyncio.get_running_loop()
+        requests = [(operation, code) for (operation, code, future) in batch]
+        try:
+            results = await loop.run_in_executor(self.executor, solve_batch, requests, self.box_size, self.max_nodes, self.timeout)
+        except Exception as err:
+            results = [(False, err)] * len(batch)
+        for (operation, code, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+async def _handle_http(solver, reader, writer):
+    # minimal HTTP/1.0 handling: GET /solve/<code> or GET /unique/<code>, one request per connection
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        status, body = 404, {'error': 'expected GET /solve/<code> or /unique/<code>'}
+        if len(request_line) >= 2 and request_line[0] == 'GET':
+            parts = request_line[1].strip('/').split('/')
+            if len(parts) == 2 and parts[0] in OPERATIONS:
+                try:
+                    status, body = 200, {'result': await solver.submit(parts[0], parts[1])}
+                except Exception as err:
+                    status, body = 422, {'error': type(err).__name__, 'message': str(err)}
+        payload = json.dumps(body).encode()
+        reason = {200: 'OK', 404: 'Not Found', 422: 'Unprocessable Entity'}[status]
+        writer.write(f'HTTP/1.0 {status} {reason}\r\nContent-Type: application/json\r\n'
+                     f'Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n'.encode() + payload)
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(solver, host='127.0.0.1', port=8080):
+    """Starts a stand-in HTTP server in front of a started BatchSolver.
+
+    Parameters
+    ----------
+    solver : BatchSolver
+    host : string
+    port : int
+        Port to listen on, 0 picks a free one.
+
+    Returns
+    -------
+    asyncio.Server
+        Listening server.
+    """
+    return await asyncio.start_server(lambda reader, writer: _handle_http(solver, reader, writer), host, port)
+
+
+async def _http_request(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f'GET {path} HTTP/1.0\r\nHost: {host}\r\n\r\n'.encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+async def load(codes, host='127.0.0.1', port=8080, requests=1000, concurrency=50, operation='solve'):
+    """Load generator, sends requests from a number of concurrent clients and measures latency.
+
+    Parameters
+    ----------
+    codes : list
+        Board codes to cycle through.
+    host : string
+    port : int
+    requests : int
+        Total number of requests to send.
+    concurrency : int
+        Number of clients sending requests at the same time.
+    operation : string
+        'solve' or 'unique'.
+
+    Returns
+    -------
+    dict
+        Request count, error count, throughput in requests per second and latency percentiles in seconds.
+    """
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            status, body = await _http_request(host, port, f'/{operation}/{codes[i % len(codes)]}')
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for i in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        'max': latencies[-1],
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help='run the stand-in HTTP server')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.add_argument('--max-batch-size', type=int, default=64)
+    serve_parser.add_argument('--max-wait', type=float, default=0.005)
+    serve_parser.add_argument('--max-nodes', type=int)
+    serve_parser.add_argument('--timeout', type=float)
+    load_parser = commands.add_parser('load', help='send load to a running server')
+    load_parser.add_argument('--host', default='127.0.0.1')
+    load_parser.add_argument('--port', type=int, default=8080)
+    load_parser.add_argument('--boards', default='tests/test-boards.json')
+    load_parser.add_argument('--clues', default='34')
+    load_parser.add_argument('--requests', type=int, default=1000)
+    load_parser.add_argument('--concurrency', type=int, default=50)
+    load_parser.add_argument('--operation', choices=OPERATIONS, default='solve')
+    args = parser.parse_args()
+
+    async def main():
+        if args.command == 'serve':
+            async with BatchSolver(args.max_batch_size, args.max_wait, max_nodes=args.max_nodes, timeout=args.timeout) as solver:
+                server = await serve(solver, args.host, args.port)
+                print(f'serving on {args.host}:{args.port}')
+                async with server:
+                    await server.serve_forever()
+        else:
+            from sudoku import util
+            codes = util.load(args.boards)[args.clues]
+            print(json.dumps(await load(codes, args.host, args.port, args.requests, args.concurrency, args.operation), indent=2))
+
+    asyncio.run(main())
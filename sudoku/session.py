@@ -0,0 +1,238 @@
+"""Interactive play session with incremental validity tracking.
+
+Every move updates per-unit digit counts, so checking a cell, listing the conflicts and telling
+whether the board is solved take constant time instead of scanning the board.
+"""
+import functools
+
+import numpy as np
+
+from sudoku import util
+
+
+@functools.lru_cache()
+def _layout(box_size):
+    # units of every cell, the cells of the row, column and box of every cell (the cell itself included)
+    # with their units, and all cells with their units
+    side = box_size * box_size
+    xs, ys = np.indices((side, side))
+    units = np.stack((xs, side + ys, 2 * side + (xs // box_size) * box_size + ys // box_size), axis=-1)
+    peers = []
+    for (x, y) in np.ndindex(side, side):
+        cells = np.nonzero((xs == x) | (ys == y) | (units[:, :, 2] == units[x, y, 2]))
+        peers.append((cells, units[cells]))
+    return units.tolist(), peers, ((xs.ravel(), ys.ravel()), units.reshape(-1, 3))
+
+
+class Session:
+    """Board being played, built from a board code.
+
+    Keeps the number of times each digit appears in each unit (rows, then columns, then boxes),
+    the (unit, digit) pairs that appear more than once and the candidates of every cell, which
+    are updated for the changed cell and its peers only.
+
+    Parameters
+    ----------
+    code : string
+        Board code listed from top left to bottom right, its filled cells are the givens.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+
+    Raises
+    ------
+    InvalidBoardException
+        If the board code doesn't represent a sudoku board.
+    """
+
+    def __init__(self, code, box_size=3):
+        board = util.code_to_board(code, box_size)
+        side = box_size * box_size
+        self.box_size = box_size
+        self.side = side
+        self.givens = board != 0
+        self.state = util.CandidateState(np.zeros_like(board), box_size)
+        self.counts = [[0] * (side + 1) for unit in range(3 * side)]
+        self.used = np.zeros(3 * side, np.int64)
+        self.clashes = set()
+        self.filled = 0
+        self.history = []
+
+        (self.units, self.peers, everything) = _layout(box_size)
+        for (x, y) in np.argwhere(board).tolist():
+            self._set(x, y, int(board[x][y]))
+        self._update_masks(*everything)
+
+    @property
+    def board(self):
+        """2D board array, 0 for empty cells."""
+        return self.state.board
+
+    def _set(self, x, y, value):
+        counts = self.counts
+        previous = int(self.state.board[x][y])
+        for unit in self.units[x][y]:
+            if previous:
+                counts[unit][previous] -= 1
+                if counts[unit][previous] == 1:
+                    self.clashes.discard((unit, previous))
+                elif counts[unit][previous] == 0:
+                    self.used[unit] &= ~(1 << (previous - 1))
+            if value:
+                counts[unit][value] += 1
+                if counts[unit][value] == 2:
+                    self.clashes.add((unit, value))
+                elif counts[unit][value] == 1:
+                    self.used[unit] |= 1 << (value - 1)
+        self.filled += (value != 0) - (previous != 0)
+        self.state.board[x][y] = value
+
+    def _update_masks(self, cells, units):
+        board = self.state.board[cells].astype(np.int64)
+        used = self.used[units]
+        used = used[:, 0] | used[:, 1] | used[:, 2]
+        self.state.masks[cells] = np.where(board > 0, np.left_shift(1, board - 1), self.state.full & ~used)
+
+    def _change(self, x, y, value):
+        value = int(value)
+        if self.givens[x][y]:
+            raise ValueError(f'Cell ({x}, {y}) is a given')
+        if not 0 <= value <= self.side:
+            raise ValueError(f'Digit must be 0 - {self.side}, got {value}')
+        previous = int(self.state.board[x][y])
+        if previous == value:
+            return False
+        self._set(x, y, value)
+        self._update_masks(*self.peers[x * self.side + y])
+        return previous
+
+    def place(self, x, y, value):
+        """Writes a digit into a cell, replacing its digit if it has one.
+
+        Parameters
+        ----------
+        x : int
+        y : int
+        value : int
+            Digit 1 - side.
+
+        Returns
+        -------
+        bool
+            Whether the digit clashes with no other digit in its row, column and box.
+
+        Raises
+        ------
+        ValueError
+            If the cell is a given or the digit is out of range.
+        """
+        if value == 0:
+            raise ValueError('Use erase to clear a cell')
+        previous = self._change(x, y, value)
+        if previous is not False:
+            self.history.append((x, y, previous))
+        return self.is_valid(x, y)
+
+    def erase(self, x, y):
+        """Clears a cell.
+
+        Raises
+        ------
+        ValueError
+            If the cell is a given.
+        """
+        previous = self._change(x, y, 0)
+        if previous is not False:
+            self.history.append((x, y, previous))
+
+    def undo(self):
+        """Takes back the last place or erase.
+
+        Returns
+        -------
+        tuple or None
+            (x, y) of the cell that changed back, or None if there is nothing to undo.
+        """
+        if not self.history:
+            return None
+        (x, y, previous) = self.history.pop()
+        self._change(x, y, previous)
+        return x, y
+
+    def is_valid(self, x, y):
+        """Checks whether a cell is filled and its digit appears once in its row, column and box.
+
+        Returns
+        -------
+        bool
+        """
+        value = int(self.state.board[x][y])
+        return value != 0 and all(self.counts[unit][value] == 1 for unit in self.units[x][y])
+
+    def is_solved(self):
+        """Checks whether every cell is filled without conflicts.
+
+        Returns
+        -------
+        bool
+        """
+        return self.filled == self.side * self.side and not self.clashes
+
+    def conflicts(self):
+        """Lists the cells whose digit appears more than once in one of their units.
+
+        Returns
+        -------
+        set
+            (x, y) cells.
+        """
+        cells = set()
+        for (unit, value) in self.clashes:
+            kind, index = divmod(unit, self.side)
+            if kind == 0:
+                xs, ys = np.full(self.side, index), np.arange(self.side)
+            elif kind == 1:
+                xs, ys = np.arange(self.side), np.full(self.side, index)
+            else:
+                (bx, by) = divmod(index, self.box_size)
+                offsets = np.arange(self.side)
+                xs = bx * self.box_size + offsets // self.box_size
+                ys = by * self.box_size + offsets % self.box_size
+            cells.update((x, y) for (x, y) in zip(xs.tolist(), ys.tolist()) if self.state.board[x][y] == value)
+        return cells
+
+    def candidates(self, x, y):
+        """Lists the digits that fit an empty cell, or the digit of a filled cell.
+
+        Returns
+        -------
+        list
+            Digits 1 - side in increasing order.
+        """
+        return self.state.candidates(x, y)
+
+    def hint(self):
+        """Finds the next deductive move from the session's candidates, see deductive.next_move.
+
+        Returns
+        -------
+        tuple or None
+            (technique, coords, candidates, eliminations), or None if no technique applies or the board is full.
+
+        Raises
+        ------
+        InvalidBoardException
+            If the board has conflicts or is not 9x9.
+        """
+        from sudoku import deductive
+        if self.clashes or self.box_size != 3:
+            raise util.InvalidBoardException
+        return deductive.next_move(self.state.board, guesses=self.state.to_guesses())
+
+    def code(self):
+        """Board code of the current board.
+
+        Returns
+        -------
+        string
+        """
+        return util.board_to_code(self.state.board, self.box_size)
@@ -0,0 +1,166 @@
+"""Compact move traces for the deductive solver.
+
+A trace stores every move as small integers in one flat array: the technique index from
+deductive.deductive_methods, the cells as x * 9 + y and the digits of each candidate list as a bitmask.
+Recording only appends to the array, names and strings are built when a trace is rendered.
+"""
+import json
+import sys
+from array import array
+
+FORMAT_VERSION = 1
+MAGIC = b'SDT1'
+
+
+def _techniques():
+    from sudoku import deductive
+    return {index: key for key, (_, index, _) in deductive.deductive_methods.items()}
+
+
+class Trace:
+    """Records deductive moves as (technique, cells, masks) integer records.
+
+    Each move is laid out as technique, cell count, cells, mask count, masks, so
+    masks can cover a single shared candidate list or one list per cell.
+
+    Parameters
+    ----------
+    data : iterable, optional
+        Flat record data, as produced by another trace.
+    """
+
+    def __init__(self, data=()):
+        self.data = array('H', data)
+        self.length = 0
+        position = 0
+        while position < len(self.data):
+            position += 2 + self.data[position + 1]
+            position += 1 + self.data[position]
+            self.length += 1
+
+    def __len__(self):
+        return self.length
+
+    def record(self, technique, coords, candidates):
+        """Appends a move.
+
+        Parameters
+        ----------
+        technique : string
+            Key of the technique in deductive.deductive_methods.
+        coords : list
+            (x, y) cells of the move.
+        candidates : list
+            Candidate lists of the move, digits 0 - 8.
+        """
+        from sudoku import deductive
+        record = [deductive.deductive_methods[technique][1], len(coords)]
+        record += [int(x) * 9 + int(y) for (x, y) in coords]
+        record.append(len(candidates))
+        record += [sum(1 << int(z) for z in digits) for digits in candidates]
+        self.data.extend(record)
+        self.length += 1
+
+    def records(self):
+        """Iterates over the raw records.
+
+        Yields
+        ------
+        tuple
+            (technique index, cells, masks) with cells as x * 9 + y and masks as digit bitmasks.
+        """
+        data = self.data
+        position = 0
+        while position < len(data):
+            technique, count = data[position], data[position + 1]
+            cells = tuple(data[position + 2:position + 2 + count])
+            position += 2 + count
+            count = data[position]
+            masks = tuple(data[position + 1:position + 1 + count])
+            position += 1 + count
+            yield technique, cells, masks
+
+    def __iter__(self):
+        """Iterates over the moves in the format returned by the scan functions.
+
+        Yields
+        ------
+        tuple
+            (technique, coords, candidates) with digits 0 - 8.
+        """
+        names = _techniques()
+        for technique, cells, masks in self.records():
+            coords = [divmod(cell, 9) for cell in cells]
+            candidates = [[z for z in range(9) if mask >> z & 1] for mask in masks]
+            yield names[technique], coords, candidates
+
+    def render(self):
+        """Renders the moves as numbered, human readable lines.
+
+        Yields
+        ------
+        string
+            One line per move.
+        """
+        from sudoku import util
+        for i, move in enumerate(self):
+            yield f'{i + 1} {util.move_string(*move)}'
+
+    def to_json(self):
+        """Serializes the trace to a JSON string of [technique, cells, masks] records."""
+        return json.dumps({'version': FORMAT_VERSION, 'moves': [[t, list(c), list(m)] for t, c, m in self.records()]})
+
+    @classmethod
+    def from_json(cls, string):
+        """Loads a trace serialized by to_json.
+
+        Parameters
+        ----------
+        string : string
+
+        Returns
+        -------
+        Trace
+        """
+        trace = cls()
+        for technique, cells, masks in json.loads(string)['moves']:
+            trace.data.extend([technique, len(cells), *cells, len(masks), *masks])
+            trace.length += 1
+        return trace
+
+    def to_bytes(self):
+        """Serializes the trace to a little-endian binary string.
+
+        Returns
+        -------
+        bytes
+        """
+        data = array('H', self.data)
+        if sys.byteorder == 'big':
+            data.byteswap()
+        return MAGIC + data.tobytes()
+
+    @classmethod
+    def from_bytes(cls, string):
+        """Loads a trace serialized by to_bytes.
+
+        Parameters
+        ----------
+        string : bytes
+
+        Returns
+        -------
+        Trace
+
+        Raises
+        ------
+        ValueError
+            If the string is not a serialized trace.
+        """
+        if not string.startswith(MAGIC):
+            raise ValueError('Not a serialized trace')
+        data = array('H')
+        data.frombytes(string[len(MAGIC):])
+        if sys.byteorder == 'big':
+            data.byteswap()
+        return cls(data)
@@ -11,68 +11,157 @@ class UnsolvableBoardException(Exception):
     pass
 
 
-def to_x(n):
+class SearchLimitException(Exception):
+    """Raised when a search runs out of its node or time budget, or is cancelled.
+
+    Attributes
+    ----------
+    partial : int or None
+        Partial result of the search, e.g. the number of solutions counted before stopping.
+    """
+
+    def __init__(self, message, partial=None):
+        super().__init__(message)
+        self.partial = partial
+
+    def __reduce__(self):
+        return (type(self), (str(self), self.partial))
+
+
+class Budget:
+    """Node and time limits for a search, which can also be cancelled from another thread.
+
+    Searches call tick once per node. The node limit is checked on every tick, the deadline and
+    cancellation only every check_interval ticks so the clock stays out of the hot loop.
+
+    Parameters
+    ----------
+    max_nodes : int, optional
+        Largest number of search nodes to visit.
+    timeout : float, optional
+        Seconds from now until the search is stopped.
+    event : threading.Event or multiprocessing.Event, optional
+        Cancels the search once set, lets other threads or processes stop it.
+    """
+
+    check_interval = 256
+
+    def __init__(self, max_nodes=None, timeout=None, event=None):
+        import time
+        self.clock = time.monotonic
+        self.max_nodes = max_nodes
+        self.deadline = None if timeout is None else self.clock() + timeout
+        self.event = event
+        self.cancelled = False
+        self.nodes = 0
+
+    def cancel(self):
+        """Stops the search at its next check."""
+        self.cancelled = True
+        if self.event is not None:
+            self.event.set()
+
+    def tick(self, partial=None):
+        """Counts a search node.
+
+        Parameters
+        ----------
+        partial : int, optional
+            Partial result to attach to the exception if the budget has run out.
+
+        Raises
+        ------
+        SearchLimitException
+            If the node limit or deadline is reached or the search was cancelled.
+        """
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SearchLimitException(f'Search exceeded {self.max_nodes} nodes', partial)
+        if self.nodes % self.check_interval == 0:
+            if self.cancelled or (self.event is not None and self.event.is_set()):
+                self.cancelled = True
+                raise SearchLimitException('Search was cancelled', partial)
+            if self.deadline is not None and self.clock() > self.deadline:
+                raise SearchLimitException('Search exceeded its time limit', partial)
+
+
+# characters used in board codes, the index of a character is the digit it represents
+CODE_CHARS = '0123456789ABCDEFGHIJKLMNOP'
+_CODE_LOOKUP = np.full(256, -1, np.int8)
+_CODE_LOOKUP[np.frombuffer(CODE_CHARS.encode('ascii'), np.uint8)] = np.arange(len(CODE_CHARS))
+
+
+def to_x(n, box_size=3):
     """Converts a code index to a board x coordinate.
 
     Parameters
     ----------
     n : int
         Board code index to be converted.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
 
     Returns
     -------
     int
         x coordinate.
     """
-    return int(n % 9)
+    return int(n % (box_size * box_size))
 
 
-def to_y(n):
+def to_y(n, box_size=3):
     """Converts a code index to a board y coordinate.
 
     Parameters
     ----------
     n : int
         Board code index to be converted.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
 
     Returns
     -------
     int
         y coordinate.
     """
-    return n // 9
+    return n // (box_size * box_size)
 
 
-def board_is_valid(board):
+def board_is_valid(board, box_size=3):
     """Checks whether a board array is valid (well constructed, not necessarily solved or solvable).
 
     Parameters
     ----------
     board : ndarray
         Board array.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
 
     Returns
     -------
     bool
         Whether the board is valid or not.
     """
+    side = box_size * box_size
     if type(board) != np.ndarray:
         return False
-    if board.shape != (9, 9):
+    if board.shape != (side, side):
         return False
-    if not ((board >= 0).all() and (board <= 9).all()):
+    if not ((board >= 0).all() and (board <= side).all()):
         return False
     return True
 
 
-def code_to_board(code):
+def code_to_board(code, box_size=3):
     """Converts a board code to a board array.
 
     Parameters
     ----------
     code : string
-        81 character board code listed from top left to bottom right.
-        Empty spaces are represented with zeros.
+        box_size ** 4 character board code listed from top left to bottom right (81 characters for 9x9 boards).
+        Empty spaces are represented with zeros, digits above 9 with the letters A - P.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
 
     Returns
     -------
@@ -84,35 +173,32 @@ def code_to_board(code):
     InvalidBoardCodeException
         If the board code doesn't represent a sudoku board.
     """
+    side = box_size * box_size
     if type(code) != str:
         raise InvalidBoardException(f'Board code must be a string, got type {type(code)}')
-    if(len(code) != 9 * 9):
+    if(len(code) != side * side):
         raise InvalidBoardException(
-            "Board code must be 81 characters long")
-    for c in code:
-        if not (ord(c) >= 48 and ord(c) <= 57):
-            raise InvalidBoardException(
-                f"Board code must only contain numbers 0 - 9")
-    board = np.zeros((9, 9), np.int8)
-
-    for i in range(9 * 9):
-        x = to_x(i)
-        y = to_y(i)
-        board[x][y] = int(code[i])
-    return board.T
+            f"Board code must be {side * side} characters long")
+    digits = _CODE_LOOKUP[np.frombuffer(code.encode('ascii', 'replace'), np.uint8)]
+    if not ((digits >= 0) & (digits <= side)).all():
+        raise InvalidBoardException(
+            f"Board code must only contain {'numbers' if side < 10 else 'characters'} 0 - {CODE_CHARS[side]}")
+    return digits.reshape(side, side)
 
 
-def board_to_code(board):
+def board_to_code(board, box_size=3):
     """Converts a board array to a code-string.
 
     Parameters
     ----------
     board : ndarray
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
 
     Returns
     -------
     string
-        81 character board code listed from top left to bottom right.
+        box_size ** 4 character board code listed from top left to bottom right.
         Empty spaces are represented with zeros.
 
     Raises
@@ -120,21 +206,67 @@ def board_to_code(board):
     InvalidBoardException
         If the board is invalid.
     """
-    if not board_is_valid(board):
+    if not board_is_valid(board, box_size):
         raise InvalidBoardException
-    code = ''
-    for y in range(9):
-        for x in range(9):
-            code += str(board.T[x][y])
-    return code
+    return ''.join(CODE_CHARS[int(digit)] for digit in board.ravel())
+
+
+def codes_to_boards(codes, box_size=3):
+    """Converts a list of board codes to a stack of flat boards in one pass.
+
+    Parameters
+    ----------
+    codes : list
+        Board codes listed from top left to bottom right.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+
+    Returns
+    -------
+    ndarray
+        uint8 array of shape (N, box_size ** 4), one board per row.
+
+    Raises
+    ------
+    InvalidBoardException
+        If a board code doesn't represent a sudoku board.
+    """
+    side = box_size * box_size
+    if any(type(code) != str or len(code) != side * side for code in codes):
+        raise InvalidBoardException(f"Board codes must be strings {side * side} characters long")
+    digits = _CODE_LOOKUP[np.frombuffer(''.join(codes).encode('ascii', 'replace'), np.uint8)]
+    if not ((digits >= 0) & (digits <= side)).all():
+        raise InvalidBoardException(
+            f"Board codes must only contain {'numbers' if side < 10 else 'characters'} 0 - {CODE_CHARS[side]}")
+    return digits.astype(np.uint8).reshape(len(codes), side * side)
 
 
-def board_is_solved(board):
+def boards_to_codes(boards):
+    """Converts a stack of boards to board codes.
+
+    Parameters
+    ----------
+    boards : ndarray
+        Stack of boards of shape (N, side, side) or flat boards of shape (N, side * side).
+
+    Returns
+    -------
+    list
+        Board codes listed from top left to bottom right.
+    """
+    boards = np.asarray(boards)
+    chars = np.frombuffer(CODE_CHARS.encode('ascii'), np.uint8)[boards.reshape(len(boards), -1)]
+    return [row.tobytes().decode('ascii') for row in chars]
+
+
+def board_is_solved(board, box_size=3):
     """Checks whether a board is solved.
 
     Parameters
     ----------
     board : ndarray
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
 
     Returns
     -------
@@ -145,16 +277,68 @@ def board_is_solved(board):
     InvalidBoardException
         If the board is invalid.
     """
-    if not board_is_valid(board):
+    if not board_is_valid(board, box_size):
         raise InvalidBoardException
-    for x in range(9):
-        for y in range(9):
-            if(not position_is_valid(board, x, y)):
-                return False
-    return True
+    return bool(boards_are_solved(board, box_size))
+
+
+def board_units(boards, box_size=3):
+    """Gathers the units (rows, columns and boxes) of a board or stack of boards.
+
+    Parameters
+    ----------
+    boards : ndarray
+        Board array of shape (9, 9) or stack of boards of shape (N, 9, 9).
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+
+    Returns
+    -------
+    ndarray
+        Array of shape (..., 27, 9) holding the 9 rows, then the 9 columns, then the 9 boxes.
+        Other box sizes give 3 * box_size ** 2 units of box_size ** 2 cells.
+    """
+    boards = np.asarray(boards)
+    side = box_size * box_size
+    lead = boards.shape[:-2]
+    columns = np.swapaxes(boards, -1, -2)
+    boxes = boards.reshape(lead + (box_size,) * 4).swapaxes(-3, -2).reshape(lead + (side, side))
+    return np.concatenate((boards, columns, boxes), axis=-2)
+
 
+def boards_are_solved(boards, box_size=3):
+    """Checks whether a board or every board in a stack is solved, without per-cell loops.
 
-def position_is_valid(board, x, y):
+    Each unit is reduced to a digit bitmask, a unit is complete exactly when its mask has bits 1 - 9 set.
+    Empty cells set bit 0, so boards with zeros are never solved.
+
+    Parameters
+    ----------
+    boards : ndarray
+        Board array of shape (9, 9) or stack of boards of shape (N, 9, 9).
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+
+    Returns
+    -------
+    bool or ndarray
+        Whether the board is solved, or a boolean array of shape (N,) for a stack.
+
+    Raises
+    ------
+    InvalidBoardException
+        If the boards are not well constructed.
+    """
+    side = box_size * box_size
+    if type(boards) != np.ndarray or boards.ndim < 2 or boards.shape[-2:] != (side, side):
+        raise InvalidBoardException
+    if not ((boards >= 0).all() and (boards <= side).all()):
+        raise InvalidBoardException
+    masks = np.bitwise_or.reduce(np.left_shift(1, board_units(boards, box_size).astype(np.int64)), axis=-1)
+    return (masks == (1 << (side + 1)) - 2).all(axis=-1)
+
+
+def position_is_valid(board, x, y, box_size=3):
     """Checks whether a specific position on a board is solved.
 
     Parameters
@@ -164,6 +348,8 @@ def position_is_valid(board, x, y):
         x coordinate of the position to be tested.
     y : int
         y coordinate of the position to be tested.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
 
     Returns
     -------
@@ -175,15 +361,16 @@ def position_is_valid(board, x, y):
     IndexError
         If the (x,y) position is out of bounds.
     """
+    side = box_size * box_size
 
     # if there are guesses in this position
     # if type(board[x][y]) != int:
     #     return False
-    if board[x][y] <= 0 or board[x][y] > 9:
+    if board[x][y] <= 0 or board[x][y] > side:
         return False
     # rowwise search
     yy = y
-    for xx in range(9):
+    for xx in range(side):
         if xx == x:
             continue
         if board[xx][yy] == board[x][y]:
@@ -191,15 +378,15 @@ def position_is_valid(board, x, y):
 
     # columnwise search
     xx = x
-    for yy in range(9):
+    for yy in range(side):
         if yy == y:
             continue
         if board[xx][yy] == board[x][y]:
             return False
 
     # boxwise search
-    for xx in range((x // 3) * 3, (x // 3) * 3 + 3):
-        for yy in range((y // 3) * 3, (y // 3) * 3 + 3):
+    for xx in range((x // box_size) * box_size, (x // box_size) * box_size + box_size):
+        for yy in range((y // box_size) * box_size, (y // box_size) * box_size + box_size):
             if xx == x and yy == y:
                 continue
             if board[xx][yy] == board[x][y]:
@@ -211,11 +398,11 @@ def position_is_valid(board, x, y):
 def print_board(board):
     """Pretty prints a board to console.
     """
-    if board.shape == (9, 9):
-        for x in range(9):
+    if board.ndim == 2:
+        for x in range(board.shape[0]):
             line = ''
-            for y in range(9):
-                line += str(board[x][y] or '_') + ' '
+            for y in range(board.shape[1]):
+                line += (CODE_CHARS[int(board[x][y])] if board[x][y] else '_') + ' '
             print(line)
     elif board.shape == (9, 9, 9):
         thic_chars = "┃━┏┓┗┛"
@@ -296,6 +483,124 @@ def update_guesses(board, x, y):
                 board[xx][yy][z] = 0
 
 
+class CandidateState:
+    """Candidates of every cell of a board as digit bitmasks, bit z is set when digit z + 1 fits the cell.
+
+    The whole state is the board and one mask per cell, so a snapshot is a copy of two small arrays
+    and searches can branch and roll back without rebuilding candidates from the board.
+
+    Parameters
+    ----------
+    board : ndarray
+        2D board, 0 for empty cells. The board is copied and not checked for validity.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+    """
+
+    def __init__(self, board, box_size=3):
+        side = box_size * box_size
+        self.box_size = box_size
+        self.board = np.array(board, dtype=np.int8)
+        self.full = (1 << side) - 1
+        bits = np.left_shift(1, self.board.astype(np.int64) - 1)
+        self.masks = np.where(self.board > 0, bits, candidate_masks(self.board, box_size))
+
+    def candidates(self, x, y):
+        """Lists the digits that fit cell (x, y).
+
+        Returns
+        -------
+        list
+            Digits 1 - side in increasing order.
+        """
+        mask = int(self.masks[x][y])
+        return [z + 1 for z in range(self.full.bit_length()) if mask >> z & 1]
+
+    def place(self, x, y, value):
+        """Fills cell (x, y) and removes the digit from the candidates of its row, column and box.
+
+        Parameters
+        ----------
+        x : int
+        y : int
+        value : int
+            Digit 1 - side.
+
+        Returns
+        -------
+        bool
+            False if an empty cell was left without candidates.
+        """
+        bit = 1 << (value - 1)
+        size = self.box_size
+        self.board[x][y] = value
+        self.masks[x, :] &= ~bit
+        self.masks[:, y] &= ~bit
+        self.masks[x // size * size:x // size * size + size, y // size * size:y // size * size + size] &= ~bit
+        self.masks[x][y] = bit
+        return bool(self.masks.all())
+
+    def propagate(self):
+        """Fills every empty cell that is down to a single candidate until none are left.
+
+        Returns
+        -------
+        bool
+            False if an empty cell was left without candidates.
+        """
+        while True:
+            singles = np.argwhere((self.board == 0) & (self.masks & (self.masks - 1) == 0))
+            if not len(singles):
+                return True
+            for (x, y) in singles.tolist():
+                mask = int(self.masks[x][y])
+                if not mask or not self.place(x, y, mask.bit_length()):
+                    return False
+
+    def eliminate(self, x, y, value):
+        """Removes a digit from the candidates of cell (x, y).
+
+        Returns
+        -------
+        bool
+            False if the cell was left without candidates.
+        """
+        self.masks[x][y] &= ~(1 << (value - 1))
+        return bool(self.masks[x][y])
+
+    def snapshot(self):
+        """Saves the state, restore brings it back.
+
+        Returns
+        -------
+        tuple
+            Copies of the board and the masks.
+        """
+        return self.board.copy(), self.masks.copy()
+
+    def restore(self, snapshot):
+        """Rolls the state back to a snapshot.
+
+        Parameters
+        ----------
+        snapshot : tuple
+            Returned by snapshot, a snapshot can be restored any number of times.
+        """
+        np.copyto(self.board, snapshot[0])
+        np.copyto(self.masks, snapshot[1])
+
+    def to_guesses(self):
+        """Converts the state to a 3D guess board.
+
+        Returns
+        -------
+        ndarray
+            Board of shape (side, side, side) with a 1 for every candidate.
+        """
+        side = self.box_size * self.box_size
+        return (self.masks[:, :, None] >> np.arange(side)) & 1
+
+
 def init_guesses(board):
     """Converts a 2D board to a 3D array with 9 slots for cell guesses.
 
@@ -317,17 +622,7 @@ def init_guesses(board):
     if not board_is_valid(board):
         raise InvalidBoardException
 
-    guess_board = np.full((9, 9, 9), [1, 1, 1, 1, 1, 1, 1, 1, 1])
-    for x in range(9):
-        for y in range(9):
-            if board[x][y] != 0:
-                for z in range(9):
-                    guess_board[x][y] = 0
-                guess_board[x][y][board[x][y] - 1] = 1
-                # remove this guess from row, column and box
-                update_guesses(guess_board, x, y)
-
-    return guess_board
+    return CandidateState(board).to_guesses()
 
 
 def remove_guesses(guess_board):
@@ -364,21 +659,64 @@ def move_string(move_type, coords, affected_candidates):
     string = move_type + ' '
     for coord in coords:
         string += '(' + alphabet[coord[0]] + ', ' + str(coord[1] + 1) + '), '
-    print_candidates = np.copy(affected_candidates) + 1
-    string += str(list(map(lambda x: list(x), print_candidates)))
+    print_candidates = [[int(candidate) + 1 for candidate in candidates] for candidates in affected_candidates]
+    string += str(print_candidates)
     return string
 
 
-def generate_guess_list(board):
-    guesses = []
-    for x in range(9):
-        for y in range(9):
-            if board[x][y] == 0:
-                xy_guesses = []
-                for i in range(1, 10):
-                    board[x][y] = i
-                    if position_is_valid(board, x, y):
-                        xy_guesses.append(i)
-                board[x][y] = 0
-                guesses.append({'x': x, 'y': y, 'guesses': xy_guesses})
-    return sorted(guesses, key=lambda guess: len(guess['guesses']))
+def candidate_masks(board, box_size=3):
+    """Computes the candidates of every empty cell as digit bitmasks.
+
+    The used digits of every row, column and box are ORed together once and each cell's candidates
+    are the digits missing from its three units, so no digit is tried against the board.
+
+    Parameters
+    ----------
+    board : ndarray
+        2D board, 0 for empty cells.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+
+    Returns
+    -------
+    ndarray
+        (side, side) array with bit z set when digit z + 1 fits the cell, 0 for filled cells.
+    """
+    board = np.asarray(board)
+    side = box_size * box_size
+    bits = np.where(board > 0, np.left_shift(1, board.astype(np.int64) - 1), 0)
+    used = np.bitwise_or.reduce(bits, axis=1)[:, None] | np.bitwise_or.reduce(bits, axis=0)[None, :]
+    boxes = np.bitwise_or.reduce(bits.reshape(box_size, box_size, box_size, box_size), axis=(1, 3))
+    used |= np.repeat(np.repeat(boxes, box_size, axis=0), box_size, axis=1)
+    return np.where(board == 0, ((1 << side) - 1) & ~used, 0)
+
+
+def candidate_list(board, box_size=3):
+    """Lists the empty cells of a board with their candidate bitmasks, fewest candidates first.
+
+    Cells with the same number of candidates stay in row order, the same order as generate_guess_list.
+
+    Parameters
+    ----------
+    board : ndarray
+        2D board, 0 for empty cells.
+    box_size : int
+        Width of a box, the board is box_size ** 2 cells wide.
+
+    Returns
+    -------
+    ndarray
+        (empty cells, 3) array of x, y and candidate bitmask rows.
+    """
+    side = box_size * box_size
+    masks = candidate_masks(board, box_size)
+    (x, y) = np.nonzero(np.asarray(board) == 0)
+    cells = np.stack((x, y, masks[x, y]), axis=1)
+    counts = ((cells[:, 2, None] >> np.arange(side)) & 1).sum(axis=1)
+    return cells[np.argsort(counts, kind='stable')]
+
+
+def generate_guess_list(board, box_size=3):
+    side = box_size * box_size
+    return [{'x': x, 'y': y, 'guesses': [z + 1 for z in range(side) if mask >> z & 1]}
+            for (x, y, mask) in candidate_list(board, box_size).tolist()]
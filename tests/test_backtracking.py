@@ -1,7 +1,7 @@
 import os
 import sys
 sys.path.append('/'.join(os.path.abspath(__file__).split('/')[:-2]))
-from sudoku import util, backtracking
+from sudoku import util, backtracking, dfs
 import numpy as np
 from tqdm import tqdm
 import pytest
@@ -53,3 +53,81 @@ def test_backtrack_count(n=1):
         solutions = backtracking.naiive_backtrack_count(code)
         assert solutions == 1
     print(f'backtrack counting solved {n} boards')
+
+
+def test_backtrack_budget():
+    empty = '0' * 81
+    with pytest.raises(util.SearchLimitException):
+        backtracking.naiive_backtrack(empty, util.Budget(max_nodes=100))
+    with pytest.raises(util.SearchLimitException) as err:
+        backtracking.naiive_backtrack_count(empty, util.Budget(max_nodes=2000))
+    assert err.value.partial >= 1
+
+
+def test_table_backtrack():
+    for code in sudokus['23'][:5] + sudokus['34'][:5]:
+        result = backtracking.table_backtrack(code)
+        assert result.solution == dfs.dfs_bitmask(code)
+        assert result.steps >= code.count('0')
+    assert backtracking.table_backtrack(sudokus['81'][0]) == (sudokus['81'][0], 0)
+
+    with pytest.raises(util.InvalidBoardException):
+        backtracking.table_backtrack('77' + sudokus['81'][0][2:])
+    with pytest.raises(util.UnsolvableBoardException):
+        # the first cell can only be a 7, which its column already has
+        backtracking.table_backtrack('0' + sudokus['81'][0][1:9] + '7' + '0' * 71)
+
+    code = '0' * 9 + sudokus['34'][0][9:]
+    count = backtracking.table_backtrack_count(code)
+    assert count.solutions == dfs.count_solutions(util.code_to_board(code)) > 1
+    assert backtracking.table_backtrack_count(code, limit=2).solutions == 2
+    assert backtracking.table_backtrack_count(sudokus['81'][0]) == (1, 0)
+    with pytest.raises(util.SearchLimitException) as err:
+        backtracking.table_backtrack_count('0' * 81, budget=util.Budget(max_nodes=2000))
+    assert err.value.partial >= 1
+
+
+def test_iter_solutions():
+    import json
+    code = '0' * 9 + sudokus['34'][0][9:]
+    solutions = list(backtracking.iter_solutions(code))
+    assert len(solutions) == len(set(solutions)) == backtracking.table_backtrack_count(code).solutions
+    assert all(util.board_is_solved(util.code_to_board(solution)) for solution in solutions)
+    assert all(all(clue in ('0', digit) for clue, digit in zip(code, solution)) for solution in solutions)
+
+    # take a few, save the state, resume later
+    first = backtracking.iter_solutions(code)
+    taken = [next(first) for i in range(5)]
+    state = json.loads(json.dumps(first.state()))
+    assert taken + list(backtracking.iter_solutions(code, state)) == solutions
+    assert list(backtracking.iter_solutions(code, first.state())) == solutions[5:]
+    skipped = backtracking.iter_solutions(code)
+    assert skipped.count(5) == 5 and list(skipped) == solutions[5:]
+    done = backtracking.iter_solutions(code)
+    list(done)
+    assert list(backtracking.iter_solutions(code, done.state())) == []
+
+    assert list(backtracking.iter_solutions(sudokus['81'][0])) == [sudokus['81'][0]]
+    with pytest.raises(ValueError):
+        backtracking.iter_solutions(sudokus['34'][1], state)
+
+
+def test_iter_solutions_resumes_after_budget():
+    code = '0' * 15 + sudokus['34'][0][15:]
+    solutions = list(backtracking.iter_solutions(code))
+    assert len(solutions) > 100
+    # interrupt by budget all the way through, resuming from the saved state each time
+    resumed = []
+    state = None
+    interruptions = 0
+    while True:
+        iterator = backtracking.iter_solutions(code, state, util.Budget(max_nodes=500))
+        try:
+            for solution in iterator:
+                resumed.append(solution)
+            break
+        except util.SearchLimitException:
+            interruptions += 1
+            state = iterator.state()
+    assert interruptions > 1
+    assert resumed == solutions
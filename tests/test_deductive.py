@@ -0,0 +1,165 @@
+import os
+import sys
+sys.path.append('/'.join(os.path.abspath(__file__).split('/')[:-2]))
+from sudoku import util, dfs, deductive
+import numpy as np
+import pytest
+
+
+sudokus = util.load('/'.join(os.path.abspath(__file__).split('/')[:-2]) + '/tests/test-boards.json')
+
+
+def scan_singles(guess_board):
+    # reference fixpoint using the scan functions
+    while deductive.naked_single_scan(guess_board)[0] or deductive.hidden_single_scan(guess_board)[0]:
+        pass
+    return guess_board
+
+
+def test_singles_propagator_matches_scans():
+    for code in sudokus['34'][:10] + sudokus['23'][:10]:
+        board = util.code_to_board(code)
+        propagated = util.init_guesses(board)
+        propagator = deductive.SinglesPropagator(propagated)
+        moves = []
+        while True:
+            move = propagator.pop()
+            if move is None:
+                break
+            moves.append(move)
+        assert (propagated == scan_singles(util.init_guesses(board))).all()
+        assert all(key in deductive.SinglesPropagator.techniques for key, _, _ in moves)
+        assert propagator.cell_counts == propagated.sum(axis=2).tolist()
+        # the two-cell units are kept up to date without rebuilding them
+        assert propagator.pairs == deductive.SinglesPropagator(propagated.copy()).pairs
+        assert propagator.solved() == (propagated.sum(axis=2) == 1).all()
+
+
+def test_singles_propagator_contradictions():
+    code = sudokus['34'][0]
+    solution = util.code_to_board(dfs.dfs_bitmask(code))
+    board = util.init_guesses(util.code_to_board(code))
+    propagator = deductive.SinglesPropagator(board)
+    (x, y) = next((x, y) for x in range(9) for y in range(9) if board[x][y].sum() > 1)
+    # keeps only a wrong candidate in an empty cell, propagation has to hit a contradiction
+    wrong = next(z for z in range(9) if board[x][y][z] and z != solution[x][y] - 1)
+    try:
+        for z in range(9):
+            if z != wrong and board[x][y][z]:
+                propagator.eliminate(x, y, z)
+        consistent = propagator.propagate()
+    except deductive.SolverFailedException:
+        consistent = False
+    assert not consistent
+
+    board = util.init_guesses(util.code_to_board(code))
+    board[x][y] = 0
+    with pytest.raises(deductive.SolverFailedException):
+        deductive.SinglesPropagator(board)
+
+
+def test_rate():
+    board = util.code_to_board(sudokus['34'][0])
+    rating = deductive.rate(board)
+    assert rating > 0
+    assert deductive.rate(board, rating) == rating
+    assert deductive.rate(board, rating - 1) is None
+    assert deductive.rate(util.code_to_board(sudokus['81'][0])) == 0
+    assert rating <= deductive.difficulty_bound(81 - 34)
+    assert util.board_is_solved(deductive.deductive_solve(board))
+
+
+def test_intersection_scan():
+    for code in sudokus['23'][:10] + sudokus['25'][:10]:
+        solution = util.code_to_board(dfs.dfs_bitmask(code))
+        board = util.init_guesses(util.code_to_board(code))
+        while deductive.SinglesPropagator(board).propagate() and deductive.intersection_scan(board)[0]:
+            pass
+        # sound: the solution keeps all of its digits
+        assert all(board[x][y][solution[x][y] - 1] for x in range(9) for y in range(9))
+        # complete: no box and line share a digit's candidates that are locked into one of them
+        for box in deductive.UNIT_CELLS[18:]:
+            for line in deductive.UNIT_CELLS[:18]:
+                shared = set(box) & set(line)
+                if not shared:
+                    continue
+                for z in range(9):
+                    for (source, target) in ((box, line), (line, box)):
+                        unsolved = [(x, y) for (x, y) in source if board[x][y][z] and board[x][y].sum() > 1]
+                        if unsolved and set(unsolved) <= shared:
+                            assert not any(board[x][y][z] for (x, y) in set(target) - shared)
+
+
+def test_next_move():
+    code = sudokus['34'][0]
+    board = util.code_to_board(code)
+    solution = util.code_to_board(dfs.dfs_bitmask(code))
+    move = deductive.next_move(board)
+    (key, [(x, y)], [[z]], eliminations) = move
+    assert key == 'naked_single' and solution[x][y] == z + 1
+    assert eliminations and all(solution[x][y] != z + 1 for (x, y, z) in eliminations)
+    assert deductive.next_move(solution) is None
+
+    # pencil marks worked through all singles, the hint has to come from a harder technique
+    for code in sudokus['23'][:10]:
+        board = util.code_to_board(code)
+        solution = util.code_to_board(dfs.dfs_bitmask(code))
+        pencil_marks = util.init_guesses(board)
+        deductive.SinglesPropagator(pencil_marks).propagate()
+        filled = util.remove_guesses(pencil_marks).astype(board.dtype)
+        move = deductive.next_move(filled, pencil_marks)
+        if move is None:
+            continue
+        assert move[0] not in deductive.SinglesPropagator.techniques
+        assert move[3] and all(solution[x][y] != z + 1 for (x, y, z) in move[3])
+
+    # an empty cell with a single pencil mark only needs to be filled in
+    board = util.code_to_board(sudokus['34'][0])
+    pencil_marks = util.init_guesses(board)
+    (x, y) = next((x, y) for x in range(9) for y in range(9) if board[x][y] == 0)
+    pencil_marks[x][y] = 0
+    pencil_marks[x][y][solution[x][y] - 1] = 1
+    assert deductive.next_move(board, pencil_marks)[:3] == ('naked_single', [(x, y)], [[solution[x][y] - 1]])
+
+
+def test_template_scan(monkeypatch):
+    table = deductive.templates()
+    assert table.shape == (46656, 3) and len(np.unique(table, axis=0)) == 46656
+    cells = np.array([deductive._unpack(words) for words in table[::997]]).astype(np.int8)
+    assert (util.board_units(cells).sum(axis=-1) == 1).all()
+
+    code = sudokus['27'][30]
+    board = util.code_to_board(code)
+    solution = util.code_to_board(dfs.dfs_bitmask(code))
+    assert deductive.rate(board) is not None
+    with monkeypatch.context() as patch:
+        for key in ('simple_coloring', 'x_chain', 'template'):
+            patch.delitem(deductive.deductive_methods, key)
+        guesses = util.init_guesses(board)
+        deductive.deductive_solve(guesses)
+        assert not util.board_is_solved(util.remove_guesses(guesses))
+    (result, coords, [[z]]) = deductive.template_scan(guesses)
+    assert result and coords
+    assert all(guesses[x][y][solution[x][y] - 1] for x in range(9) for y in range(9))
+    assert util.board_is_solved(deductive.deductive_solve(guesses))
+
+    guesses = util.init_guesses(board)
+    guesses[solution == 5, 4] = 0
+    with pytest.raises(deductive.SolverFailedException):
+        deductive.template_scan(guesses)
+
+
+def test_single_digit_chains(monkeypatch):
+    for key in ('simple_coloring', 'x_chain', 'template'):
+        monkeypatch.delitem(deductive.deductive_methods, key)
+    found = {'simple_coloring': 0, 'x_chain': 0}
+    for code in sudokus['23'][:12]:
+        solution = util.code_to_board(dfs.dfs_bitmask(code))
+        stuck = util.init_guesses(util.code_to_board(code))
+        deductive.deductive_solve(stuck)
+        for key, scan in (('simple_coloring', deductive.simple_coloring_scan), ('x_chain', deductive.x_chain_scan)):
+            board = stuck.copy()
+            while deductive.SinglesPropagator(board).propagate() and scan(board)[0]:
+                found[key] += 1
+            assert all(board[x][y][solution[x][y] - 1] for x in range(9) for y in range(9))
+    assert found['simple_coloring'] and found['x_chain']
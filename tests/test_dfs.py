@@ -33,3 +33,55 @@ def test_dfs(n=50):
         solution = dfs.dfs(code)
         assert util.board_is_solved(util.code_to_board(solution))
     print(f'dfs solved {n} boards')
+
+
+def test_dfs_bitmask():
+    for code in sudokus['23'][:20] + sudokus['81'][:1]:
+        solution = dfs.dfs_bitmask(code)
+        assert util.board_is_solved(util.code_to_board(solution))
+        assert all(a == b or a == '0' for a, b in zip(code, solution))
+        assert dfs.test_unique(util.code_to_board(code))
+
+    code = sudokus['81'][0]
+    with pytest.raises(util.UnsolvableBoardException):
+        dfs.dfs_bitmask('77' + code[2:])
+
+    # removing clues from a unique board gives it more solutions
+    board = util.code_to_board(sudokus['23'][0])
+    board[board.nonzero()[0][:2], board.nonzero()[1][:2]] = 0
+    assert not dfs.test_unique(board)
+    assert dfs.count_solutions(board) == recursive_count(board)
+    assert dfs.count_solutions(board, limit=2) == 2
+
+    assert dfs.count_solutions(np.zeros((4, 4), np.int8), 2) == 288
+    assert dfs.test_unique(util.code_to_board('1000002000300004', 2)) is False
+
+
+def recursive_count(board):
+    board = np.copy(board)
+    return dfs.test_unique_recursive(board, util.generate_guess_list(board))
+
+
+def test_random_solution():
+    for box_size in [2, 3, 4]:
+        side = box_size * box_size
+        rng = np.random.default_rng(box_size)
+        solution = dfs.random_solution(np.zeros((side, side), np.int8), box_size, rng)
+        assert util.board_is_solved(solution, box_size)
+        assert not (solution == dfs.random_solution(np.zeros((side, side), np.int8), box_size, rng)).all()
+
+
+def test_search_budgets():
+    empty = '0' * 81
+    with pytest.raises(util.SearchLimitException):
+        dfs.dfs(empty, util.Budget(max_nodes=10))
+    with pytest.raises(util.SearchLimitException):
+        dfs.dfs_bitmask(empty, budget=util.Budget(max_nodes=10))
+    with pytest.raises(util.SearchLimitException) as err:
+        dfs.count_solutions(util.code_to_board(empty), budget=util.Budget(max_nodes=1000))
+    assert err.value.partial > 0
+    with pytest.raises(util.SearchLimitException):
+        dfs.test_unique(util.code_to_board(empty), budget=util.Budget(max_nodes=10))
+
+    code = sudokus['34'][0]
+    assert dfs.dfs_bitmask(code, budget=util.Budget(max_nodes=1000, timeout=10)) == dfs.dfs(code, util.Budget(max_nodes=1000))
@@ -0,0 +1,134 @@
+import os
+import sys
+sys.path.append('/'.join(os.path.abspath(__file__).split('/')[:-2]))
+from sudoku import util, dfs, deductive, generate
+import numpy as np
+import pytest
+
+
+np.random.seed(0)
+filled = generate.fill_board()
+
+
+def test_fill_board():
+    assert util.board_is_solved(filled)
+    with pytest.raises(ValueError):
+        generate.fill_board(method='guess')
+
+    np.random.seed(1)
+    boards = [generate.fill_board(method='search') for i in range(3)]
+    boards += [generate.fill_board(method='propagate') for i in range(300)]
+    assert util.boards_are_solved(np.array(boards)).all()
+    # every digit shows up about equally often in any cell
+    corners = np.bincount(np.array(boards)[3:, 0, 0], minlength=10)[1:]
+    centers = np.bincount(np.array(boards)[3:, 4, 4], minlength=10)[1:]
+    assert corners.min() > 10 and centers.min() > 10
+
+
+def test_symmetry_orbits():
+    with pytest.raises(ValueError):
+        generate.symmetry_orbits('spiral')
+    assert len(generate.symmetry_orbits()) == 81
+    assert len(generate.symmetry_orbits('rotational')) == 41
+    assert len(generate.symmetry_orbits('rotational4')) == 21
+    assert len(generate.symmetry_orbits('mirror4')) == 25
+    for symmetry in generate.SYMMETRIES:
+        orbits = generate.symmetry_orbits(symmetry)
+        assert sorted(position for orbit in orbits for position in orbit) == sorted((x, y) for x in range(9) for y in range(9))
+
+    mask = np.zeros((9, 9), bool)
+    mask[0] = True
+    assert generate.symmetry_orbits('horizontal', mask) == [((0, y), (0, 8 - y)) for y in range(4)] + [((0, 4),)]
+    assert generate.symmetry_orbits('vertical', mask) == []
+
+
+def test_generate_symmetric():
+    board = generate.generate(filled, symmetry='rotational')
+    assert dfs.test_unique(np.copy(board))
+    assert ((board != 0) == (board != 0)[::-1, ::-1]).all()
+    assert ((board == 0) | (board == filled)).all()
+
+    mask = np.zeros((9, 9), bool)
+    mask[:5] = True
+    board = generate.generate(filled, symmetry='horizontal', mask=mask, target_clues=70)
+    assert np.count_nonzero(board) == 70
+    assert (board[5:] == filled[5:]).all()
+    assert dfs.test_unique(np.copy(board))
+
+
+def test_generate_difficulty(monkeypatch):
+    board = generate.generate(filled, symmetry='rotational4', difficulty=(5, 20))
+    rating = deductive.rate(board)
+    assert 5 <= rating <= 20
+    assert dfs.test_unique(np.copy(board))
+
+    assert generate.generate(filled, difficulty=(10000, 20000)) is None
+    with pytest.raises(generate.GenerationFailedException):
+        generate.generate_graded((10000, 20000), attempts=1)
+
+    # with the estimate a band out of reach is given up before rating the removals
+    calls = []
+    rate = deductive.rate
+    monkeypatch.setattr(deductive, 'rate', lambda *args: calls.append(args) or rate(*args))
+    assert generate.generate(filled, difficulty=(400, 500), estimate=True) is None
+    assert len(calls) <= 5
+    assert deductive.difficulty_estimate(60) < deductive.difficulty_bound(60)
+
+
+def test_generate_box_sizes():
+    for box_size in [2, 4]:
+        side = box_size * box_size
+        filled_board = generate.fill_board(box_size=box_size)
+        assert util.board_is_solved(filled_board, box_size)
+        board = generate.generate(filled_board, symmetry='rotational', box_size=box_size, target_clues=side * side // 2)
+        assert np.count_nonzero(board) <= side * side // 2 + 1
+        assert ((board != 0) == (board != 0)[::-1, ::-1]).all()
+        assert dfs.test_unique(board, box_size)
+
+    with pytest.raises(ValueError):
+        generate.generate(filled_board, difficulty=(0, 10), box_size=4)
+
+
+def test_generate_speculative():
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(2) as executor:
+        for (seed, symmetry, target_clues) in [(0, None, None), (1, 'rotational', None), (2, None, 40)]:
+            np.random.seed(seed)
+            sequential = generate.generate(filled, symmetry, target_clues=target_clues)
+            np.random.seed(seed)
+            speculative = generate.generate(filled, symmetry, target_clues=target_clues, executor=executor, batch_size=6)
+            assert (sequential == speculative).all()
+        with pytest.raises(ValueError):
+            generate.generate(filled, difficulty=(5, 20), executor=executor)
+
+
+def test_generate_speculative_processes():
+    from concurrent.futures import ProcessPoolExecutor
+    # trials are pickled to the workers, the board has to come out unique and the same for a seed
+    with ProcessPoolExecutor(2) as executor:
+        boards = []
+        for seed in (3, 3, 4):
+            np.random.seed(seed)
+            boards.append(generate.generate(filled, 'rotational', executor=executor, batch_size=4))
+    np.random.seed(3)
+    sequential = generate.generate(filled, 'rotational')
+    for board in boards:
+        assert dfs.test_unique(board)
+        assert ((board == 0) | (board == filled)).all()
+    assert (boards[0] == boards[1]).all() and (boards[0] == sequential).all()
+    assert not (boards[0] == boards[2]).all()
+
+
+def test_unavoidable_sets():
+    sets = generate.unavoidable_sets(filled)
+    assert 4 <= len(sets[0]) and len(sets[-1]) <= 18
+    for cells in sets:
+        # swapping the two digits of a set gives a second solution
+        (a, b) = sorted({filled[x][y] for (x, y) in cells})
+        swapped = np.copy(filled)
+        for (x, y) in cells:
+            swapped[x][y] = a + b - filled[x][y]
+        assert util.board_is_solved(swapped)
+
+    board = generate.generate(filled)
+    assert all(any(board[x][y] for (x, y) in cells) for cells in sets)
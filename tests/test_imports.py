@@ -0,0 +1,55 @@
+import os
+import sys
+import subprocess
+import json
+
+root = '/'.join(os.path.abspath(__file__).split('/')[:-2])
+
+# import time budgets in seconds, measured inside a fresh interpreter
+PACKAGE_BUDGET = 0.05
+SOLVER_BUDGET = 1.0
+
+
+def import_in_subprocess(statement):
+    script = (
+        'import sys, time, json\n'
+        f'sys.path.insert(0, {root!r})\n'
+        'start = time.perf_counter()\n'
+        f'{statement}\n'
+        'elapsed = time.perf_counter() - start\n'
+        'print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))\n'
+    )
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def test_package_import_is_lazy():
+    result = import_in_subprocess('import sudoku')
+    assert result['elapsed'] < PACKAGE_BUDGET
+    assert 'numpy' not in result['modules']
+    assert not any(module.startswith('sudoku.') for module in result['modules'])
+
+
+def test_solver_import_skips_optional_modules():
+    result = import_in_subprocess('import sudoku; sudoku.dfs')
+    assert result['elapsed'] < SOLVER_BUDGET
+    assert 'sudoku.dfs' in result['modules']
+    assert 'sudoku.deductive' not in result['modules']
+    assert 'tqdm' not in result['modules']
+
+    result = import_in_subprocess('from sudoku import generate')
+    assert result['elapsed'] < SOLVER_BUDGET
+    assert 'sudoku.deductive' not in result['modules']
+    assert 'tqdm' not in result['modules']
+
+
+def test_lazy_attributes():
+    import sudoku
+    assert sudoku.dfs.dfs.__module__ == 'sudoku.dfs'
+    assert 'generate' in dir(sudoku)
+    try:
+        sudoku.missing
+    except AttributeError as err:
+        assert 'missing' in str(err)
+    else:
+        assert False
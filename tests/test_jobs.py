@@ -0,0 +1,91 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+sys.path.append('/'.join(os.path.abspath(__file__).split('/')[:-2]))
+from sudoku import util, dfs, jobs
+import pytest
+
+
+def test_job_lifecycle(tmp_path):
+    directory = str(tmp_path / 'job')
+    spec = jobs.create_job(directory, 5, shard_size=2, seed=7)
+    assert [shard['count'] for shard in spec['shards']] == [2, 2, 1]
+    assert len({shard['seed'] for shard in spec['shards']}) == 3
+    with pytest.raises(FileExistsError):
+        jobs.create_job(directory, 5)
+
+    assert jobs.run_job(directory, max_shards=1) == [0]
+    assert jobs.job_status(directory) == {'done': 1, 'claimed': 0, 'pending': 2}
+    with pytest.raises(jobs.IncompleteJobException):
+        jobs.merge_job(directory, str(tmp_path / 'out.txt'))
+
+    # another worker holds shard 1, it is skipped until its claim goes stale
+    open(os.path.join(directory, 'shards', '00001.claim'), 'w').close()
+    assert jobs.run_job(directory) == [2]
+    assert jobs.job_status(directory) == {'done': 2, 'claimed': 1, 'pending': 0}
+    assert jobs.run_job(directory, stale_after=0) == [1]
+    assert jobs.run_job(directory) == []
+
+    output = str(tmp_path / 'out.txt')
+    assert jobs.merge_job(directory, output) == 5
+    with open(output) as merged:
+        lines = merged.read().splitlines()
+    assert len(lines) == 5
+    for line in lines:
+        (puzzle, solution) = line.split()
+        assert dfs.dfs_bitmask(puzzle) == solution
+        assert dfs.test_unique(util.code_to_board(puzzle))
+    assert not [name for name in os.listdir(os.path.join(directory, 'shards')) if name.startswith('.tmp')]
+
+    # shards only depend on the job seed
+    other = str(tmp_path / 'other')
+    jobs.create_job(other, 5, shard_size=2, seed=7)
+    jobs.run_job(other)
+    jobs.merge_job(other, str(tmp_path / 'other.txt'))
+    with open(str(tmp_path / 'other.txt')) as merged:
+        assert merged.read().splitlines() == lines
+
+
+def test_claims_stay_with_live_workers(tmp_path, monkeypatch):
+    directory = str(tmp_path / 'job')
+    jobs.create_job(directory, 4, shard_size=1)
+
+    def slow_shard(shard, **options):
+        time.sleep(1)
+        return [str(shard['index'])]
+    monkeypatch.setattr(jobs, 'generate_shard', slow_shard)
+
+    # shards take longer than the stale timeout, heartbeats keep the other worker away
+    results, errors = {}, []
+
+    def work(name):
+        try:
+            results[name] = jobs.run_job(directory, name, stale_after=0.3)
+        except Exception as err:
+            errors.append(err)
+    threads = [threading.Thread(target=work, args=(name,)) for name in ('a', 'b')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert sorted(results['a'] + results['b']) == [0, 1, 2, 3]
+    assert jobs.job_status(directory) == {'done': 4, 'claimed': 0, 'pending': 0}
+    assert not [name for name in os.listdir(os.path.join(directory, 'shards')) if name.endswith('.claim') or '.claim.' in name]
+
+
+def test_dead_worker_claim(tmp_path):
+    directory = str(tmp_path / 'job')
+    jobs.create_job(directory, 2, shard_size=1)
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    # a claim of a process that is gone from this host is taken over without waiting for it to go stale
+    with open(os.path.join(directory, 'shards', '00000.claim'), 'w') as claim_file:
+        claim_file.write(json.dumps({'worker': 'dead', 'host': jobs.socket.gethostname(), 'pid': process.pid, 'token': 'x'}))
+    with open(os.path.join(directory, 'shards', '00001.claim'), 'w') as claim_file:
+        claim_file.write(json.dumps({'worker': 'alive', 'host': jobs.socket.gethostname(), 'pid': os.getpid(), 'token': 'y'}))
+    assert jobs.run_job(directory, stale_after=None) == [0]
+    assert jobs.job_status(directory) == {'done': 1, 'claimed': 1, 'pending': 0}
@@ -0,0 +1,95 @@
+import os
+import sys
+sys.path.append('/'.join(os.path.abspath(__file__).split('/')[:-2]))
+from sudoku import util, dfs, deductive, parallel
+import numpy as np
+import pytest
+
+
+sudokus = util.load('/'.join(os.path.abspath(__file__).split('/')[:-2]) + '/tests/test-boards.json')
+
+
+def test_split_board():
+    board = util.code_to_board('0' * 9 + sudokus['34'][0][9:])
+    parts = parallel.split_board(board, parts=20)
+    assert len(parts) >= 20
+    assert sum(dfs.count_solutions(part) for part in parts) == dfs.count_solutions(board)
+    assert all((part[board != 0] == board[board != 0]).all() for part in parts)
+
+    solved = util.code_to_board(sudokus['81'][0])
+    assert len(parallel.split_board(solved)) == 1
+
+
+def test_parallel_count():
+    board = util.code_to_board(sudokus['23'][0])
+    for (x, y) in np.argwhere(board)[:3]:
+        board[x][y] = 0
+    expected = dfs.count_solutions(board)
+    assert expected > 100
+    assert parallel.count_solutions(board, processes=2) == expected
+    assert parallel.count_solutions(board, limit=100, processes=2) == 100
+    assert parallel.count_solutions(util.code_to_board(sudokus['34'][0]), processes=2) == 1
+
+
+def test_solve_boards():
+    codes = sudokus['25'][:10] + sudokus['34'][:10]
+    unsolvable = '12' + sudokus['25'][0][2:]
+    assert dfs.count_solutions(util.code_to_board(unsolvable)) == 0
+    solutions, solved = parallel.solve_boards(codes + [unsolvable], processes=2, chunk_size=3)
+    assert solved.tolist() == [1] * 20 + [0]
+    assert util.boards_to_codes(solutions[:20]) == [dfs.dfs_bitmask(code) for code in codes]
+    assert not solutions[20].any()
+
+    with parallel.SharedBoards((20, 81)) as boards:
+        boards.array[:] = util.codes_to_boards(codes)
+        attached = parallel.SharedBoards.attach(boards.spec)
+        assert (attached.array == boards.array).all()
+        attached.close()
+        assert (parallel.solve_boards(boards, processes=2)[0] == solutions[:20]).all()
+        ratings = parallel.rate_boards(boards, processes=2)
+    assert ratings.tolist() == [-1 if (r := deductive.rate(util.code_to_board(code))) is None else r for code in codes]
+
+
+def test_batch_pool_reuse():
+    codes = sudokus['34'][:12]
+    expected = [dfs.dfs_bitmask(code) for code in codes]
+    with parallel.BatchPool(2) as pool:
+        # boards already in shared memory are not copied into an input block
+        with parallel.SharedBoards((2, 81)) as shared:
+            shared.array[:] = util.codes_to_boards(codes[:2]).reshape(2, 81)
+            solutions, solved = pool.solve(shared)
+            assert pool.input is None and util.boards_to_codes(solutions) == expected[:2]
+        solutions, solved = pool.solve(codes[:4])
+        blocks = (pool.input, pool.output, pool.results)
+        assert util.boards_to_codes(solutions) == expected[:4]
+        # a smaller batch reuses the blocks, a larger one grows them
+        solutions, solved = pool.solve(['12' + codes[0][2:]] + codes[4:6])
+        assert (pool.input, pool.output, pool.results) == blocks
+        assert solved.tolist() == [0, 1, 1] and not solutions[0].any()
+        assert util.boards_to_codes(solutions[1:]) == expected[4:6]
+        old_names = {block.spec[0] for block in blocks}
+        solutions, solved = pool.solve(codes)
+        assert pool.input is not blocks[0] and util.boards_to_codes(solutions) == expected
+        # no worker keeps a mapping of the replaced blocks
+        assert not any(old_names & set(names) for names in pool._release([]))
+        assert pool.rate(codes[:3]).tolist() == [deductive.rate(util.code_to_board(code)) for code in codes[:3]]
+
+
+def test_parallel_budgets():
+    board = util.code_to_board(sudokus['23'][0])
+    for (x, y) in np.argwhere(board)[:3]:
+        board[x][y] = 0
+    expected = dfs.count_solutions(board)
+    with pytest.raises(util.SearchLimitException) as err:
+        parallel.count_solutions(board, processes=2, max_nodes=200)
+    assert 0 <= err.value.partial < expected
+    with pytest.raises(util.SearchLimitException):
+        parallel.count_solutions(util.code_to_board('0' * 81), processes=2, timeout=0.2)
+    assert parallel.count_solutions(board, processes=2, max_nodes=10 ** 7, timeout=60) == expected
+
+    codes = [sudokus['34'][0], '0' * 81]
+    solutions, solved = parallel.solve_boards(codes, processes=2, max_nodes=60)
+    assert solved.tolist() == [1, -1] and not solutions[1].any()
+    assert util.boards_to_codes(solutions[:1]) == [dfs.dfs_bitmask(codes[0])]
+    assert parallel.rate_boards(codes[:1], processes=1, max_nodes=3).tolist() == [-2]
+    assert parallel.rate_boards(codes[:1], processes=1, timeout=60).tolist() == [deductive.rate(util.code_to_board(codes[0]))]
@@ -0,0 +1,62 @@
+import os
+import sys
+sys.path.append('/'.join(os.path.abspath(__file__).split('/')[:-2]))
+from sudoku import util, generate
+from sudoku.progress import ProgressHook, CounterHook
+import multiprocessing
+import numpy as np
+
+
+class RecordingHook(ProgressHook):
+    def __init__(self):
+        self.events = []
+
+    def start(self, stage, total):
+        self.events.append(('start', stage, total))
+
+    def update(self, stage, n=1):
+        self.events.append(('update', stage, n))
+
+    def close(self, stage):
+        self.events.append(('close', stage))
+
+
+def test_recording_hook():
+    hook = RecordingHook()
+    filled = generate.fill_board(hook)
+    assert hook.events[0] == ('start', 'fill_board', 81)
+    assert hook.events[-1] == ('close', 'fill_board')
+    assert sum(event[2] for event in hook.events if event[:2] == ('update', 'fill_board')) == 81
+
+    hook = RecordingHook()
+    generate.generate(filled, symmetry='mirror4', progress=hook)
+    assert hook.events[0] == ('start', 'generate', 25)
+    assert hook.events[-1] == ('close', 'generate')
+    assert hook.events.count(('update', 'generate', 1)) == 25
+
+    hook = RecordingHook()
+    assert generate.generate(filled, difficulty=(10000, 20000), progress=hook) is None
+    assert hook.events[-1] == ('close', 'generate')
+
+
+worker_hook = None
+
+
+def init_worker(hook):
+    global worker_hook
+    worker_hook = hook
+
+
+def fill_in_worker(seed):
+    np.random.seed(seed)
+    return util.board_to_code(generate.fill_board(worker_hook))
+
+
+def test_counter_hook_across_pool():
+    hook = CounterHook()
+    with multiprocessing.Pool(2, initializer=init_worker, initargs=(hook,)) as pool:
+        codes = pool.map(fill_in_worker, range(4))
+    assert len(set(codes)) == 4
+    counts = hook.counts()
+    assert counts['fill_board'] == {'started': 4, 'steps': 4 * 81, 'finished': 4}
+    assert counts['generate'] == {'started': 0, 'steps': 0, 'finished': 0}
@@ -0,0 +1,89 @@
+import os
+import sys
+sys.path.append('/'.join(os.path.abspath(__file__).split('/')[:-2]))
+from sudoku import util, service
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import pytest
+
+
+sudokus = util.load('/'.join(os.path.abspath(__file__).split('/')[:-2]) + '/tests/test-boards.json')
+
+
+def test_solve_batch():
+    code = sudokus['34'][0]
+    results = service.solve_batch([('solve', code), ('unique', code), ('solve', '77' + sudokus['81'][0][2:]), ('rate', code)])
+    assert results[0][0] and util.board_is_solved(util.code_to_board(results[0][1]))
+    assert results[1] == (True, True)
+    assert not results[2][0] and isinstance(results[2][1], util.UnsolvableBoardException)
+    assert not results[3][0] and isinstance(results[3][1], ValueError)
+
+
+def test_batch_solver_coalesces_requests():
+    codes = sudokus['34'][:20]
+
+    async def run():
+        with ThreadPoolExecutor(1) as executor:
+            async with service.BatchSolver(max_batch_size=8, max_wait=1, executor=executor) as solver:
+                solutions = await asyncio.gather(*[solver.solve(code) for code in codes])
+                assert solver.stats == {'requests': 20, 'batches': 3}
+                with pytest.raises(util.InvalidBoardException):
+                    await solver.solve('123')
+                assert await solver.is_unique(codes[0])
+        return solutions
+
+    for code, solution in zip(codes, asyncio.run(run())):
+        assert util.board_is_solved(util.code_to_board(solution))
+        assert all(a == b or a == '0' for a, b in zip(code, solution))
+
+
+def test_max_wait_flushes_partial_batches():
+    async def run():
+        with ThreadPoolExecutor(1) as executor:
+            async with service.BatchSolver(max_batch_size=100, max_wait=0.01, executor=executor) as solver:
+                await asyncio.wait_for(solver.is_unique(sudokus['34'][0]), 5)
+                return solver.stats
+
+    assert asyncio.run(run()) == {'requests': 1, 'batches': 1}
+
+
+def test_http_round_trip():
+    async def run():
+        with ThreadPoolExecutor(1) as executor:
+            async with service.BatchSolver(max_batch_size=16, max_wait=0.005, executor=executor) as solver:
+                server = await service.serve(solver, port=0)
+                port = server.sockets[0].getsockname()[1]
+                async with server:
+                    report = await service.load(sudokus['34'][:10], port=port, requests=30, concurrency=5)
+                    status, body = await service._http_request('127.0.0.1', port, '/unique/123')
+                    missing, _ = await service._http_request('127.0.0.1', port, '/rate/123')
+        return report, status, body, missing
+
+    report, status, body, missing = asyncio.run(run())
+    assert report['requests'] == 30 and report['errors'] == 0
+    assert status == 422 and body['error'] == 'InvalidBoardException'
+    assert missing == 404
+
+
+def test_request_budget():
+    results = service.solve_batch([('unique', '0' * 81), ('solve', sudokus['34'][0])], max_nodes=60)
+    assert not results[0][0] and isinstance(results[0][1], util.SearchLimitException)
+    assert results[1][0]
+
+
+def test_close_flushes_partial_batch():
+    async def run():
+        with ThreadPoolExecutor(1) as executor:
+            solver = service.BatchSolver(max_batch_size=100, max_wait=5, executor=executor)
+            await solver.start()
+            request = asyncio.ensure_future(solver.solve(sudokus['34'][0]))
+            await asyncio.sleep(0.1)
+            await asyncio.wait_for(solver.close(), 5)
+            assert request.done()
+            with pytest.raises(RuntimeError):
+                await solver.solve(sudokus['34'][0])
+            return await request, solver.stats
+
+    solution, stats = asyncio.run(run())
+    assert util.board_is_solved(util.code_to_board(solution))
+    assert stats == {'requests': 1, 'batches': 1}
@@ -0,0 +1,70 @@
+import os
+import sys
+sys.path.append('/'.join(os.path.abspath(__file__).split('/')[:-2]))
+from sudoku import util, dfs, deductive
+from sudoku.session import Session
+import numpy as np
+import pytest
+
+
+sudokus = util.load('/'.join(os.path.abspath(__file__).split('/')[:-2]) + '/tests/test-boards.json')
+
+
+def test_session_moves():
+    code = sudokus['34'][0]
+    solution = util.code_to_board(dfs.dfs_bitmask(code))
+    session = Session(code)
+    assert session.hint() == deductive.next_move(util.code_to_board(code))
+    (x, y) = [tuple(cell) for cell in np.argwhere(session.board == 0).tolist()][0]
+    (gx, gy) = [tuple(cell) for cell in np.argwhere(session.board != 0).tolist()][0]
+    with pytest.raises(ValueError):
+        session.place(gx, gy, 1)
+
+    # a digit given in exactly one peer of the cell clashes with that clue only
+    peers = [(px, py) for (px, py) in np.argwhere(session.givens).tolist()
+             if (px, py) != (x, y) and (px == x or py == y or (px // 3, py // 3) == (x // 3, y // 3))]
+    (clue, wrong) = next(((px, py), int(session.board[px][py])) for (px, py) in peers
+                         if sum(session.board[qx][qy] == session.board[px][py] for (qx, qy) in peers) == 1)
+    assert not session.place(x, y, wrong)
+    assert session.conflicts() == {(x, y), clue}
+    assert not session.is_valid(*clue)
+    with pytest.raises(util.InvalidBoardException):
+        session.hint()
+    assert session.undo() == (x, y)
+    assert session.board[x][y] == 0 and not session.conflicts()
+    assert session.undo() is None
+
+    for (x, y) in np.argwhere(session.board == 0).tolist():
+        assert not session.is_solved()
+        assert solution[x][y] in session.candidates(x, y)
+        assert session.place(x, y, solution[x][y])
+    assert session.is_solved() and session.code() == util.board_to_code(solution)
+    session.erase(x, y)
+    assert not session.is_solved()
+    session.undo()
+    assert session.is_solved()
+
+
+def test_session_matches_rescans():
+    rng = np.random.default_rng(3)
+    for box_size, code in ((3, sudokus['25'][1]), (2, '1000000200300004')):
+        side = box_size * box_size
+        session = Session(code, box_size)
+        empty = np.argwhere(session.givens == 0).tolist()
+        for step in range(300):
+            (x, y) = empty[rng.integers(len(empty))]
+            action = rng.random()
+            if action < 0.6:
+                session.place(x, y, int(rng.integers(1, side + 1)))
+            elif action < 0.8:
+                session.erase(x, y)
+            else:
+                session.undo()
+            board = session.board
+            for (x, y) in np.argwhere(board).tolist():
+                assert session.is_valid(x, y) == util.position_is_valid(board, x, y, box_size)
+            assert session.conflicts() == {(x, y) for (x, y) in np.argwhere(board).tolist()
+                                           if not util.position_is_valid(board, x, y, box_size)}
+            empties = board == 0
+            assert (session.state.masks[empties] == util.candidate_masks(board, box_size)[empties]).all()
+            assert session.is_solved() == util.board_is_solved(board, box_size)
@@ -0,0 +1,36 @@
+import os
+import sys
+sys.path.append('/'.join(os.path.abspath(__file__).split('/')[:-2]))
+from sudoku import util, deductive
+from sudoku.trace import Trace
+import pytest
+
+
+sudokus = util.load('/'.join(os.path.abspath(__file__).split('/')[:-2]) + '/tests/test-boards.json')
+
+
+def test_trace_records_moves():
+    board = util.code_to_board(sudokus['34'][0])
+    moves = list(deductive.solve_moves(util.init_guesses(board)))
+    trace = Trace()
+    solved = deductive.deductive_solve(board, trace=trace)
+    assert util.board_is_solved(solved)
+    assert len(trace) == len(moves)
+    for (key, coords, candidates), (t_key, t_coords, t_candidates) in zip(moves, trace):
+        assert key == t_key
+        assert [tuple(map(int, coord)) for coord in coords] == list(t_coords)
+        assert [sorted(map(int, digits)) for digits in candidates] == t_candidates
+    lines = list(trace.render())
+    assert len(lines) == len(moves)
+    assert lines[0].startswith('1 ' + moves[0][0])
+
+
+def test_trace_serialization():
+    trace = Trace()
+    deductive.deductive_solve(util.code_to_board(sudokus['27'][0]), trace=trace)
+    for loaded in (Trace.from_json(trace.to_json()), Trace.from_bytes(trace.to_bytes())):
+        assert len(loaded) == len(trace)
+        assert list(loaded.records()) == list(trace.records())
+    assert len(trace.to_bytes()) == 4 + 2 * len(trace.data)
+    with pytest.raises(ValueError):
+        Trace.from_bytes(b'not a trace')
@@ -117,3 +117,145 @@ def test_init_guesses():
     board = util.code_to_board(boards['34'][0])
     # TODO
     pass
+
+
+def test_boards_are_solved():
+    def reference(board):
+        return all(util.position_is_valid(board, x, y) for x in range(9) for y in range(9))
+
+    solved = util.code_to_board(boards['81'][0])
+    stack = [solved, util.code_to_board(boards['24'][0]), util.code_to_board(boards['34'][0])]
+    rng = np.random.default_rng(0)
+    for i in range(50):
+        board = np.copy(solved)
+        cells = rng.integers(0, 9, size=(rng.integers(1, 4), 2))
+        board[cells[:, 0], cells[:, 1]] = rng.integers(0, 10, size=len(cells))
+        stack.append(board)
+    stack.append(np.zeros((9, 9), np.int8))
+    stack = np.array(stack)
+
+    results = util.boards_are_solved(stack)
+    assert results.shape == (len(stack),)
+    for board, result in zip(stack, results):
+        assert result == reference(board)
+        assert util.board_is_solved(board) == reference(board)
+
+    with pytest.raises(util.InvalidBoardException):
+        util.boards_are_solved(np.zeros((3, 9, 8)))
+    stack[0][0][0] = 10
+    with pytest.raises(util.InvalidBoardException):
+        util.boards_are_solved(stack)
+
+
+def test_box_sizes():
+    assert util.to_x(17, 4) == 1
+    assert util.to_y(17, 4) == 1
+
+    code = '1234341221434321'
+    board = util.code_to_board(code, 2)
+    assert board.shape == (4, 4)
+    assert util.board_is_valid(board, 2)
+    assert not util.board_is_valid(board)
+    assert util.board_is_solved(board, 2)
+    assert util.board_to_code(board, 2) == code
+    with pytest.raises(util.InvalidBoardException) as err:
+        util.code_to_board('1235341221434321', 2)
+    assert 'Board code must only contain numbers 0 - 4' in str(err.value)
+
+    side = 16
+    solved = np.array([[(4 * (x % 4) + x // 4 + y) % side + 1 for y in range(side)] for x in range(side)], np.int8)
+    code = util.board_to_code(solved, 4)
+    assert len(code) == 256 and 'G' in code
+    assert (util.code_to_board(code, 4) == solved).all()
+    assert util.board_is_solved(solved, 4)
+    assert all(util.position_is_valid(solved, x, y, 4) for x in range(side) for y in range(side))
+    solved[0][0], solved[0][1] = solved[0][1], solved[0][0]
+    assert not util.board_is_solved(solved, 4)
+    assert not util.position_is_valid(solved, 0, 0, 4)
+    with pytest.raises(util.InvalidBoardException) as err:
+        util.code_to_board(':' * 256, 4)
+    assert 'Board code must only contain characters 0 - G' in str(err.value)
+
+
+def test_budget():
+    budget = util.Budget(max_nodes=3)
+    for i in range(3):
+        budget.tick()
+    with pytest.raises(util.SearchLimitException) as err:
+        budget.tick(5)
+    assert err.value.partial == 5
+
+    budget = util.Budget(timeout=0)
+    with pytest.raises(util.SearchLimitException) as err:
+        for i in range(util.Budget.check_interval):
+            budget.tick()
+    assert 'time limit' in str(err.value)
+
+    import threading
+    event = threading.Event()
+    budget = util.Budget(event=event)
+    util.Budget(event=event).cancel()
+    with pytest.raises(util.SearchLimitException) as err:
+        for i in range(util.Budget.check_interval):
+            budget.tick()
+    assert 'cancelled' in str(err.value)
+
+    import pickle
+    err = pickle.loads(pickle.dumps(util.SearchLimitException('stopped', 7)))
+    assert str(err) == 'stopped' and err.partial == 7
+
+
+def test_candidate_state():
+    for (code, box_size) in [(boards['25'][0], 3), (boards['34'][1], 3), ('1000000000000040', 2)]:
+        side = box_size * box_size
+        board = util.code_to_board(code, box_size)
+        state = util.CandidateState(board, box_size)
+        for x in range(side):
+            for y in range(side):
+                if board[x][y]:
+                    assert state.candidates(x, y) == [board[x][y]]
+                    continue
+                expected = []
+                for value in range(1, side + 1):
+                    board[x][y] = value
+                    if util.position_is_valid(board, x, y, box_size):
+                        expected.append(value)
+                board[x][y] = 0
+                assert state.candidates(x, y) == expected
+        assert (state.to_guesses().sum(axis=2) == [[len(state.candidates(x, y)) for y in range(side)] for x in range(side)]).all()
+
+    board = util.code_to_board(boards['25'][0])
+    state = util.CandidateState(board)
+    saved = state.snapshot()
+    (x, y) = next((x, y) for x in range(9) for y in range(9) if board[x][y] == 0)
+    value = state.candidates(x, y)[0]
+    assert state.place(x, y, value)
+    assert state.board[x][y] == value and board[x][y] == 0
+    assert all(value not in state.candidates(xx, y) for xx in range(9) if xx != x)
+    state.restore(saved)
+    assert (state.board == board).all() and (state.masks == util.CandidateState(board).masks).all()
+    for value in state.candidates(x, y)[:-1]:
+        assert state.eliminate(x, y, value)
+    assert not state.eliminate(x, y, state.candidates(x, y)[0])
+
+
+def test_generate_guess_list():
+    for code in boards['23'][:3] + boards['34'][:3]:
+        board = util.code_to_board(code)
+        guesses = util.generate_guess_list(board)
+        expected = []
+        for x in range(9):
+            for y in range(9):
+                if board[x][y] == 0:
+                    values = []
+                    for value in range(1, 10):
+                        board[x][y] = value
+                        if util.position_is_valid(board, x, y):
+                            values.append(value)
+                    board[x][y] = 0
+                    expected.append({'x': x, 'y': y, 'guesses': values})
+        assert guesses == sorted(expected, key=lambda guess: len(guess['guesses']))
+        cells = util.candidate_list(board)
+        assert cells.shape == (len(guesses), 3)
+        assert [(x, y) for (x, y, mask) in cells.tolist()] == [(guess['x'], guess['y']) for guess in guesses]
+        assert (util.candidate_masks(board)[board != 0] == 0).all()